@@ -20,7 +20,21 @@
 #
 # where TAG is a valid tag name, ex 'DateTimeOriginal'
 #
-# These 2 are useful when you are retrieving a large list of images
+# To only extract some tags, skipping the work for all the others and
+# stopping as soon as they have been found, pass the --tags argument with a
+# comma separated list, or as
+#    tags = EXIF.process_file(f, tags={'EXIF DateTimeOriginal', 'GPS'})
+#
+# where each name is a returned tag name, an IFD name for all of its tags, or
+# 'JPEGThumbnail' or 'TIFFThumbnail'.  Thumbnails and MakerNotes are only
+# processed if requested.
+#
+# These are useful when you are retrieving a large list of images
+#
+# The EXIF information is read into memory once (TIFF files are memory
+# mapped) rather than with a seek and read for every value.  To read from
+# the file as it is processed instead, call with:
+#    tags = EXIF.process_file(f, buffered=False)
 #
 #
 # To return an error on invalid tags,
@@ -83,6 +97,13 @@
 #
 
 import collections
+from concurrent import futures
+import itertools
+import json
+import mmap
+import os
+import sqlite3
+import struct
 
 # Don't throw an exception when given an out of range character.
 def make_string(seq):
@@ -1186,6 +1207,10 @@ def s2n_intel(str):
         y = y + 8
     return x
 
+# struct format characters for unsigned integers of each length, used to
+# decode arrays of integers in one go
+STRUCT_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
 # ratio object that eventually will be able to reduce itself to lowest
 # common denominator for printing
 def gcd(a, b):
@@ -1211,12 +1236,76 @@ class Ratio:
             self.num = self.num / div
             self.den = self.den / div
 
+# convert bytes to integer in the byte order endian ('I' for Intel, 'M' for
+# Motorola), extending the sign from the bit at the top of length bytes if
+# signed
+def bytes_to_n(slice, endian, length, signed=0):
+    val = int.from_bytes(slice, 'little' if endian == 'I' else 'big')
+    # Sign extension ?
+    if signed:
+        msb=1 << (8*length-1)
+        if val & msb:
+            val=val-(msb << 1)
+    return val
+
+# convert a block of count consecutive integers of the same length to a list,
+# decoding them all at once with struct where possible.  Integers missing from
+# a short block (at the end of a truncated file) are 0.
+def unpack_n(block, endian, length, count, signed=0):
+    fmt = STRUCT_FORMATS.get(length)
+    if fmt and len(block) == length * count:
+        if signed:
+            fmt = fmt.lower()
+        fmt = ('<' if endian == 'I' else '>') + str(count) + fmt
+        return list(struct.unpack(fmt, block))
+    return [bytes_to_n(block[i:i + length], endian, length, signed)
+            for i in range(0, length * count, length)]
+
+# return the number of bytes holding the values of a field of field_type with
+# count items, which is 0 for the large tags that are dropped
+def field_values_length(field_type, count, tag_name):
+    if field_type == 2:
+        # XXX investigate
+        # sometimes gets too big to fit in int value
+        if count < (2**31):
+            return count
+        return 0
+    # XXX investigate
+    # some entries get too big to handle could be malformed
+    # file or problem with self.s2n
+    # Dropping them causes problems with tags that are
+    # supposed to have long values!  Fix up one important case.
+    if count < 1000 or tag_name == 'MakerNote':
+        return count * FIELD_TYPES[field_type][0]
+    #print "Warning: dropping large tag:", tag, tag_name
+    return 0
+
+# decorator for an attribute computed by function the first time it is used and
+# then stored in the instance, like functools.cached_property without its lock
+class lazy_attribute:
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name] = self.function(instance)
+        return value
+
 # for ease of dealing with tags
+#
+# Tags read from an IFD are decoded on first use, as most callers only look at
+# a few of them: instead of values they are given source, a tuple of the buffer
+# holding the field, its byte order, start, and the length from
+# field_values_length, and instead of printable (None) the tag_entry from the
+# tag dictionary used to make the values printable.
 class IFD_Tag:
     def __init__(self, printable, tag, field_type, values, field_offset,
-                 field_length):
+                 field_length, source=None, tag_entry=None):
         # printable version of data
-        self.printable = printable
+        if printable is not None:
+            self.printable = printable
         # tag ID number
         self.tag = tag
         # field type as index into FIELD_TYPES
@@ -1226,7 +1315,63 @@ class IFD_Tag:
         # length of data field in bytes
         self.field_length = field_length
         # either a string or array of data items
-        self.values = values
+        if source is None:
+            self.values = values
+        self.source = source
+        self.tag_entry = tag_entry
+
+    # decoded the first time they are used, unless given to __init__
+    @lazy_attribute
+    def values(self):
+        data, endian, start, length = self.source
+        block = data[start:start + length]
+        if self.field_type == 2:
+            # special case: null-terminated ASCII string
+            # Drop any garbage after a null.
+            return block.split(b'\x00', 1)[0].decode('latin-1')
+        typelen = FIELD_TYPES[self.field_type][0]
+        signed = (self.field_type in [6, 8, 9, 10])
+        if self.field_type in (5, 10):
+            # ratios, as pairs of numerator and denominator
+            numbers = unpack_n(block, endian, 4, 2 * (length // typelen), signed)
+            return [Ratio(numbers[i], numbers[i + 1]) for i in range(0, len(numbers), 2)]
+        return unpack_n(block, endian, typelen, length // typelen, signed)
+
+    @lazy_attribute
+    def printable(self):
+        values = self.values
+        # now 'values' is either a string or an array
+        count = self.field_length // FIELD_TYPES[self.field_type][0]
+        if count == 1 and self.field_type != 2:
+            printable=str(values[0])
+        elif count > 50 and len(values) > 20 :
+            printable=str( values[0:20] )[0:-1] + ", ... ]"
+        else:
+            printable=str(values)
+
+        # compute printable version of values
+        tag_entry = self.tag_entry
+        if tag_entry:
+            if len(tag_entry) != 1:
+                # optional 2nd tag element is present
+                if callable(tag_entry[1]):
+                    # call mapping function
+                    printable = tag_entry[1](values)
+                else:
+                    printable = ''
+                    for i in values:
+                        # use lookup table for this tag
+                        printable += tag_entry[1].get(i, repr(i))
+        return printable
+
+    # decode everything before pickling rather than pickling the buffer
+    def __getstate__(self):
+        # force decoding
+        self.values
+        self.printable
+        state = self.__dict__.copy()
+        state['source'] = None
+        return state
 
     def __str__(self):
         return self.printable
@@ -1239,43 +1384,103 @@ class IFD_Tag:
 
 # class that handles an EXIF header
 class EXIF_header:
-    def __init__(self, file, endian, offset, fake_exif, strict, debug=0):
+    # data is an optional in-memory copy of the start of the file (a bytes
+    # object or mmap) covering the EXIF information, which avoids a seek and
+    # read for every integer.  Reads outside it fall back to the file.
+    def __init__(self, file, endian, offset, fake_exif, strict, debug=0, data=None):
         self.file = file
         self.endian = endian
         self.offset = offset
         self.fake_exif = fake_exif
         self.strict = strict
         self.debug = debug
+        self.data = data
         self.tags = {}
+        # the names selected by select_tags, the names needed to find them,
+        # and those not found yet
+        self.selected = None
+        self.needed = None
+        self.remaining = None
+
+    # restrict extraction to tags, a collection of names which may be tag
+    # names like 'EXIF DateTimeOriginal', IFD names like 'GPS' for all the
+    # tags in an IFD, 'JPEGThumbnail' or 'TIFFThumbnail'.  Only these tags,
+    # and the tags needed to find them, are decoded.
+    def select_tags(self, tags):
+        self.selected = set(tags)
+        self.remaining = set(tags)
+        self.needed = set(tags)
+        for name in tags:
+            ifd_name = name.split(' ')[0]
+            if ifd_name in ('EXIF', 'MakerNote'):
+                self.needed.add('Image ExifOffset')
+            if ifd_name == 'MakerNote':
+                # the camera specific decoding works on the whole MakerNote
+                self.needed.update(('MakerNote', 'EXIF MakerNote', 'Image Make'))
+            if ifd_name == 'GPS':
+                self.needed.add('Image GPSInfo')
+            if name == 'JPEGThumbnail':
+                self.needed.update(('Thumbnail JPEGInterchangeFormat',
+                                    'Thumbnail JPEGInterchangeFormatLength'))
+            if name == 'TIFFThumbnail':
+                self.needed.update(('Thumbnail Compression', 'Thumbnail StripOffsets',
+                                    'Thumbnail StripByteCounts'))
+
+    # return whether a tag in an IFD (or the thumbnail named tag_name if
+    # ifd_name is None) needs decoding
+    def wants(self, ifd_name, tag_name):
+        if self.needed is None:
+            return True
+        if ifd_name is None:
+            return tag_name in self.needed
+        return ifd_name in self.needed or ifd_name + ' ' + tag_name in self.needed
+
+    # return whether any tag in an IFD needs decoding
+    def wants_IFD(self, ifd_name):
+        if self.needed is None:
+            return True
+        return any(name == ifd_name or name.startswith(ifd_name + ' ') for name in self.needed)
+
+    # record that the tag or IFD named name has been extracted
+    def found(self, name):
+        if self.remaining is not None:
+            self.remaining.discard(name)
+
+    # return whether all the selected tags have been found, so no more of the
+    # file needs to be read
+    def all_found(self):
+        return self.remaining is not None and not self.remaining
+
+    # return the extracted tags, leaving out any not selected
+    def selected_tags(self):
+        if self.selected is None:
+            return self.tags
+        return dict((key, tag) for key, tag in self.tags.items()
+                    if key in self.selected or key.split(' ')[0] in self.selected)
+
+    # read length bytes at offset (relative to the EXIF information like s2n)
+    def read(self, offset, length):
+        start = self.offset + offset
+        if self.data is not None and 0 <= start and start + length <= len(self.data):
+            return self.data[start:start + length]
+        self.file.seek(start)
+        return self.file.read(length)
 
     # convert slice to integer, based on sign and endian flags
     # usually this offset is assumed to be relative to the beginning of the
     # start of the EXIF information.  For some cameras that use relative tags,
     # this offset may be relative to some other starting point.
     def s2n(self, offset, length, signed=0):
-        self.file.seek(self.offset+offset)
-        slice=self.file.read(length)
-        if self.endian == 'I':
-            val=s2n_intel(slice)
-        else:
-            val=s2n_motorola(slice)
-        # Sign extension ?
-        if signed:
-            msb=1 << (8*length-1)
-            if val & msb:
-                val=val-(msb << 1)
-        return val
+        return bytes_to_n(self.read(offset, length), self.endian, length, signed)
+
+    # convert count consecutive integers of the same length to a list, with a
+    # single read and decoding them all at once with struct where possible
+    def s2n_list(self, offset, length, count, signed=0):
+        return unpack_n(self.read(offset, length * count), self.endian, length, count, signed)
 
     # convert offset to string
     def n2s(self, offset, length):
-        s = ''
-        for dummy in range(length):
-            if self.endian == 'I':
-                s = s + chr(offset & 0xFF)
-            else:
-                s = chr(offset & 0xFF) + s
-            offset = offset >> 8
-        return s
+        return offset.to_bytes(length, 'little' if self.endian == 'I' else 'big')
 
     # return first IFD
     def first_IFD(self):
@@ -1288,20 +1493,28 @@ class EXIF_header:
 
     # return list of IFDs in header
     def list_IFDs(self):
+        return list(self.iter_IFDs())
+
+    # generate the IFDs in header, only reading the pointer to each as it is
+    # needed
+    def iter_IFDs(self):
         i=self.first_IFD()
-        a=[]
         while i:
-            a.append(i)
+            yield i
             i=self.next_IFD(i)
-        return a
 
     # return list of entries in this IFD
     def dump_IFD(self, ifd, ifd_name, dict=EXIF_TAGS, relative=0, stop_tag='UNDEF'):
         entries=self.s2n(ifd, 2)
+        # read all the entries at once, as (tag, type, count, value or offset),
+        # treating any missing past the end of the file as zeros
+        entry_data = self.read(ifd + 2, 12 * entries).ljust(12 * entries, b'\x00')
+        entry_format = ('<' if self.endian == 'I' else '>') + 'HHII'
         for i in range(entries):
             # entry is index of start of this IFD in the file
             entry = ifd + 2 + 12 * i
-            tag = self.s2n(entry, 2)
+            tag, field_type, count, value_offset = struct.unpack_from(entry_format, entry_data,
+                                                                      12 * i)
 
             # get tag name early to avoid errors, help debug
             tag_entry = dict.get(tag)
@@ -1310,9 +1523,8 @@ class EXIF_header:
             else:
                 tag_name = 'Tag 0x%04X' % tag
 
-            # ignore certain tags for faster processing
-            if not (not detailed and tag in IGNORE_TAGS):
-                field_type = self.s2n(entry + 2, 2)
+            # ignore certain tags, and those not selected, for faster processing
+            if not (not detailed and tag in IGNORE_TAGS) and self.wants(ifd_name, tag_name):
                 
                 # unknown field type
                 if not 0 < field_type < len(FIELD_TYPES):
@@ -1322,7 +1534,6 @@ class EXIF_header:
                         raise ValueError('unknown type %d in tag 0x%04X' % (field_type, tag))
 
                 typelen = FIELD_TYPES[field_type][0]
-                count = self.s2n(entry + 4, 4)
                 # Adjust for tag id/type/count (2+2+4 bytes)
                 # Now we point at either the data or the 2nd level offset
                 offset = entry + 8
@@ -1337,84 +1548,39 @@ class EXIF_header:
                     # other relative offsets, which would have to be computed here
                     # slightly differently.
                     if relative:
-                        tmp_offset = self.s2n(offset, 4)
-                        offset = tmp_offset + ifd - 8
+                        offset = value_offset + ifd - 8
                         if self.fake_exif:
                             offset = offset + 18
                     else:
-                        offset = self.s2n(offset, 4)
+                        offset = value_offset
 
                 field_offset = offset
-                if field_type == 2:
-                    # special case: null-terminated ASCII string
-                    # XXX investigate
-                    # sometimes gets too big to fit in int value
-                    if count != 0 and count < (2**31):
-                        self.file.seek(self.offset + offset)
-                        values = self.file.read(count)
-                        #print values
-                        # Drop any garbage after a null.
-                        values = values.split(b'\x00', 1)[0]
-                    else:
-                        values = ''
-                else:
-                    values = []
-                    signed = (field_type in [6, 8, 9, 10])
-                    
-                    # XXX investigate
-                    # some entries get too big to handle could be malformed
-                    # file or problem with self.s2n
-                    if count < 1000:
-                        for dummy in range(count):
-                            if field_type in (5, 10):
-                                # a ratio
-                                value = Ratio(self.s2n(offset, 4, signed),
-                                              self.s2n(offset + 4, 4, signed))
-                            else:
-                                value = self.s2n(offset, typelen, signed)
-                            values.append(value)
-                            offset = offset + typelen
-                    # The test above causes problems with tags that are 
-                    # supposed to have long values!  Fix up one important case.
-                    elif tag_name == 'MakerNote' :
-                        for dummy in range(count):
-                            value = self.s2n(offset, typelen, signed)
-                            values.append(value)
-                            offset = offset + typelen
-                    #else :
-                    #    print "Warning: dropping large tag:", tag, tag_name
-                
-                # now 'values' is either a string or an array
-                if count == 1 and field_type != 2:
-                    printable=str(values[0])
-                elif count > 50 and len(values) > 20 :
-                    printable=str( values[0:20] )[0:-1] + ", ... ]"
+                length = field_values_length(field_type, count, tag_name)
+                start = self.offset + offset
+                if self.data is None or not (0 <= start and start + length <= len(self.data)):
+                    # read now, as the file may be closed before the tag is
+                    # used
+                    source = (self.read(offset, length), self.endian, 0, length)
+                elif isinstance(self.data, mmap.mmap):
+                    # copy from a memory map, which is closed once the
+                    # file has been processed
+                    source = (self.data[start:start + length], self.endian, 0, length)
                 else:
-                    printable=str(values)
-
-                # compute printable version of values
-                if tag_entry:
-                    if len(tag_entry) != 1:
-                        # optional 2nd tag element is present
-                        if isinstance(tag_entry[1], collections.Callable):
-                            # call mapping function
-                            printable = tag_entry[1](values)
-                        else:
-                            printable = ''
-                            for i in values:
-                                # use lookup table for this tag
-                                printable += tag_entry[1].get(i, repr(i))
-
-                self.tags[ifd_name + ' ' + tag_name] = IFD_Tag(printable, tag,
-                                                          field_type,
-                                                          values, field_offset,
-                                                          count * typelen)
+                    source = (self.data, self.endian, start, length)
+                self.tags[ifd_name + ' ' + tag_name] = IFD_Tag(None, tag, field_type,
+                                                          None, field_offset,
+                                                          count * typelen, source,
+                                                          tag_entry)
                 if self.debug:
                     print(' debug:   %s: %s' % (tag_name,
                                                 repr(self.tags[ifd_name + ' ' + tag_name])))
+                self.found(ifd_name + ' ' + tag_name)
+                if self.all_found():
+                    break
 
             if tag_name == stop_tag:
                 break
+        self.found(ifd_name)
 
     # extract uncompressed TIFF thumbnail (like pulling teeth)
     # we take advantage of the pre-existing layout in the thumbnail IFD as
@@ -1423,12 +1589,11 @@ class EXIF_header:
         entries = self.s2n(thumb_ifd, 2)
         # this is header plus offset to IFD ...
         if self.endian == 'M':
-            tiff = 'MM\x00*\x00\x00\x00\x08'
+            tiff = b'MM\x00*\x00\x00\x00\x08'
         else:
-            tiff = 'II*\x00\x08\x00\x00\x00'
+            tiff = b'II*\x00\x08\x00\x00\x00'
         # ... plus thumbnail IFD data plus a null "next IFD" pointer
-        self.file.seek(self.offset+thumb_ifd)
-        tiff += self.file.read(entries*12+2)+'\x00\x00\x00\x00'
+        tiff += self.read(thumb_ifd, entries*12+2)+b'\x00\x00\x00\x00'
 
         # fix up large value offset pointers into data area
         for i in range(entries):
@@ -1455,8 +1620,7 @@ class EXIF_header:
                     strip_off = newoff
                     strip_len = 4
                 # get original data and store it
-                self.file.seek(self.offset + oldoff)
-                tiff += self.file.read(count * typelen)
+                tiff += self.read(oldoff, count * typelen)
 
         # add pixel strips and update strip offset info
         old_offsets = self.tags['Thumbnail StripOffsets'].values
@@ -1467,8 +1631,7 @@ class EXIF_header:
             tiff = tiff[:strip_off] + offset + tiff[strip_off + strip_len:]
             strip_off += strip_len
             # add pixel strip to end
-            self.file.seek(self.offset + old_offsets[i])
-            tiff += self.file.read(old_counts[i])
+            tiff += self.read(old_offsets[i], old_counts[i])
 
         self.tags['TIFFThumbnail'] = tiff
 
@@ -1593,10 +1756,32 @@ class EXIF_header:
             self.tags['MakerNote '+name]=IFD_Tag(str(val), None, 0, None,
                                                  None, None)
 
+# read the start of a file up to end (the end of the EXIF information) into
+# memory so it can be decoded without a seek and read for every integer.
+# TIFF files may keep their IFDs anywhere so without an end the whole file is
+# memory mapped, falling back to reading it for file objects without a file
+# descriptor.
+def read_exif_data(f, end=None):
+    if end is None:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            pass
+    f.seek(0)
+    return f.read() if end is None else f.read(end)
+
 # process an image file (expects an open file object)
 # this is the function that has to deal with all the arbitrary nasty bits
 # of the EXIF standard
-def process_file(f, stop_tag='UNDEF', details=True, strict=False, debug=False):
+#
+# With buffered (the default) the EXIF information is read into memory once
+# rather than with a seek and read for every integer.
+#
+# tags optionally selects the tags to return as for EXIF_header.select_tags,
+# skipping the work for all the others and stopping as soon as they have all
+# been found.
+def process_file(f, stop_tag='UNDEF', details=True, strict=False, debug=False, buffered=True,
+                 tags=None):
     # yah it's cheesy...
     global detailed
     detailed = details
@@ -1609,9 +1794,10 @@ def process_file(f, stop_tag='UNDEF', details=True, strict=False, debug=False):
     if data[0:4] in [b'II*\x00', b'MM\x00*']:
         # it's a TIFF file
         f.seek(0)
-        endian = f.read(1)
+        endian = f.read(1).decode('ascii')
         f.read(1)
         offset = 0
+        exif_end = None
     elif data[0:2] == b'\xff\xd8':
         # it's a JPEG file
         while data[2:3] == b'\xff' and data[6:10] in (b'JFIF', b'JFXX', b'OLYM', b'Phot'):
@@ -1623,7 +1809,9 @@ def process_file(f, stop_tag='UNDEF', details=True, strict=False, debug=False):
         if data[2:3] == b'\xff' and data[6:10] == b'Exif':
             # detected EXIF header
             offset = f.tell()
-            endian = f.read(1)
+            endian = f.read(1).decode('ascii')
+            # the EXIF information ends with the APP1 segment
+            exif_end = offset - 8 + data[4]*256+data[5]
         else:
             # no EXIF information
             return {}
@@ -1634,79 +1822,305 @@ def process_file(f, stop_tag='UNDEF', details=True, strict=False, debug=False):
     # deal with the EXIF info we found
     if debug:
         print({'I': 'Intel', 'M': 'Motorola'}[endian], 'format')
-    hdr = EXIF_header(f, endian, offset, fake_exif, strict, debug)
-    ifd_list = hdr.list_IFDs()
-    ctr = 0
-    for i in ifd_list:
-        if ctr == 0:
-            IFD_name = 'Image'
-        elif ctr == 1:
-            IFD_name = 'Thumbnail'
-            thumb_ifd = i
-        else:
-            IFD_name = 'IFD %d' % ctr
-        if debug:
-            print(' IFD %d (%s) at offset %d:' % (ctr, IFD_name, i))
-        hdr.dump_IFD(i, IFD_name, stop_tag=stop_tag)
-        # EXIF IFD
-        exif_off = hdr.tags.get(IFD_name+' ExifOffset')
-        if exif_off:
+    # tags copy their bytes out of the memory map, if any, so it can be closed
+    # rather than keeping a file descriptor open for as long as they are kept
+    exif_data = read_exif_data(f, exif_end) if buffered else None
+    hdr = EXIF_header(f, endian, offset, fake_exif, strict, debug, exif_data)
+    try:
+        if tags is not None:
+            hdr.select_tags(tags)
+        ctr = 0
+        for i in hdr.iter_IFDs():
+            if ctr == 0:
+                IFD_name = 'Image'
+            elif ctr == 1:
+                IFD_name = 'Thumbnail'
+                thumb_ifd = i
+            else:
+                IFD_name = 'IFD %d' % ctr
+            if not hdr.wants_IFD(IFD_name):
+                ctr += 1
+                continue
             if debug:
-                print(' EXIF SubIFD at offset %d:' % exif_off.values[0])
-            hdr.dump_IFD(exif_off.values[0], 'EXIF', stop_tag=stop_tag)
-            # Interoperability IFD contained in EXIF IFD
-            intr_off = hdr.tags.get('EXIF SubIFD InteroperabilityOffset')
-            if intr_off:
+                print(' IFD %d (%s) at offset %d:' % (ctr, IFD_name, i))
+            hdr.dump_IFD(i, IFD_name, stop_tag=stop_tag)
+            # EXIF IFD
+            exif_off = hdr.tags.get(IFD_name+' ExifOffset')
+            if exif_off:
                 if debug:
-                    print(' EXIF Interoperability SubSubIFD at offset %d:' \
-                          % intr_off.values[0])
-                hdr.dump_IFD(intr_off.values[0], 'EXIF Interoperability',
-                             dict=INTR_TAGS, stop_tag=stop_tag)
-        # GPS IFD
-        gps_off = hdr.tags.get(IFD_name+' GPSInfo')
-        if gps_off:
-            if debug:
-                print(' GPS SubIFD at offset %d:' % gps_off.values[0])
-            hdr.dump_IFD(gps_off.values[0], 'GPS', dict=GPS_TAGS, stop_tag=stop_tag)
-        ctr += 1
-
-    # extract uncompressed TIFF thumbnail
-    thumb = hdr.tags.get('Thumbnail Compression')
-    if thumb and thumb.printable == 'Uncompressed TIFF':
-        hdr.extract_TIFF_thumbnail(thumb_ifd)
-
-    # JPEG thumbnail (thankfully the JPEG data is stored as a unit)
-    thumb_off = hdr.tags.get('Thumbnail JPEGInterchangeFormat')
-    if thumb_off:
-        f.seek(offset+thumb_off.values[0])
-        size = hdr.tags['Thumbnail JPEGInterchangeFormatLength'].values[0]
-        hdr.tags['JPEGThumbnail'] = f.read(size)
-
-    # deal with MakerNote contained in EXIF IFD
-    # (Some apps use MakerNote tags but do not use a format for which we
-    # have a description, do not process these).
-    if 'EXIF MakerNote' in hdr.tags and 'Image Make' in hdr.tags and detailed:
-        hdr.decode_maker_note()
-
-    # Sometimes in a TIFF file, a JPEG thumbnail is hidden in the MakerNote
-    # since it's not allowed in a uncompressed TIFF IFD
-    if 'JPEGThumbnail' not in hdr.tags:
-        thumb_off=hdr.tags.get('MakerNote JPEGThumbnail')
-        if thumb_off:
-            f.seek(offset+thumb_off.values[0])
-            hdr.tags['JPEGThumbnail']=file.read(thumb_off.field_length)
-
-    return hdr.tags
-
+                    print(' EXIF SubIFD at offset %d:' % exif_off.values[0])
+                hdr.dump_IFD(exif_off.values[0], 'EXIF', stop_tag=stop_tag)
+                # Interoperability IFD contained in EXIF IFD
+                intr_off = hdr.tags.get('EXIF SubIFD InteroperabilityOffset')
+                if intr_off:
+                    if debug:
+                        print(' EXIF Interoperability SubSubIFD at offset %d:' \
+                              % intr_off.values[0])
+                    hdr.dump_IFD(intr_off.values[0], 'EXIF Interoperability',
+                                 dict=INTR_TAGS, stop_tag=stop_tag)
+            # GPS IFD
+            gps_off = hdr.tags.get(IFD_name+' GPSInfo')
+            if gps_off:
+                if debug:
+                    print(' GPS SubIFD at offset %d:' % gps_off.values[0])
+                hdr.dump_IFD(gps_off.values[0], 'GPS', dict=GPS_TAGS, stop_tag=stop_tag)
+            ctr += 1
+            if hdr.all_found():
+                return hdr.selected_tags()
+
+        # extract uncompressed TIFF thumbnail
+        thumb = hdr.tags.get('Thumbnail Compression')
+        if thumb and thumb.printable == 'Uncompressed TIFF' and hdr.wants(None, 'TIFFThumbnail'):
+            hdr.extract_TIFF_thumbnail(thumb_ifd)
+
+        # JPEG thumbnail (thankfully the JPEG data is stored as a unit)
+        thumb_off = hdr.tags.get('Thumbnail JPEGInterchangeFormat')
+        if thumb_off and hdr.wants(None, 'JPEGThumbnail'):
+            size = hdr.tags['Thumbnail JPEGInterchangeFormatLength'].values[0]
+            hdr.tags['JPEGThumbnail'] = hdr.read(thumb_off.values[0], size)
+
+        # deal with MakerNote contained in EXIF IFD
+        # (Some apps use MakerNote tags but do not use a format for which we
+        # have a description, do not process these).
+        if ('EXIF MakerNote' in hdr.tags and 'Image Make' in hdr.tags and detailed
+                and hdr.wants_IFD('MakerNote')):
+            hdr.decode_maker_note()
+
+        # Sometimes in a TIFF file, a JPEG thumbnail is hidden in the MakerNote
+        # since it's not allowed in a uncompressed TIFF IFD
+        if 'JPEGThumbnail' not in hdr.tags and hdr.wants(None, 'JPEGThumbnail'):
+            thumb_off=hdr.tags.get('MakerNote JPEGThumbnail')
+            if thumb_off:
+                hdr.tags['JPEGThumbnail']=hdr.read(thumb_off.values[0], thumb_off.field_length)
+
+        return hdr.selected_tags()
+    finally:
+        if isinstance(exif_data, mmap.mmap):
+            exif_data.close()
+
+
+# file name extensions of the image files found when walking directories,
+# including the camera raw formats based on TIFF
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.tif', '.tiff', '.dng', '.nef', '.cr2', '.orf',
+                    '.pef', '.arw')
+
+# number of files processed by each task sent to a worker process, and the
+# number of tasks kept queued for each worker by process_paths
+PATHS_PER_TASK = 32
+TASKS_PER_WORKER = 4
+
+# generate the paths of the files named in paths, replacing directories with
+# the image files in the trees below them in sorted order
+def walk_paths(paths):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, name)
+
+# convert the tags returned by process_file to a dictionary of their
+# printable values, leaving out the thumbnails
+def printable_tags(tags):
+    return dict((name, str(tag.printable)) for name, tag in tags.items()
+                if name not in ('JPEGThumbnail', 'TIFFThumbnail'))
+
+# process the image file at path, returning a tuple of (path, printable tags,
+# error) where error is None or a description of why the file could not be
+# processed
+def process_path(path, stop_tag='UNDEF', details=True, strict=False, tags=None):
+    return process_path_cacheable(path, stop_tag, details, strict, tags)[0]
+
+# process the image file at path like process_path, returning a tuple of the
+# result and whether it can be cached.  Errors opening or reading the file,
+# such as a missing permission, may be fixed without changing the file so are
+# not cached, unlike errors decoding it.
+def process_path_cacheable(path, stop_tag='UNDEF', details=True, strict=False, tags=None):
+    try:
+        with open(path, 'rb') as f:
+            file_tags = process_file(f, stop_tag=stop_tag, details=details, strict=strict,
+                                     tags=tags)
+        return ((path, printable_tags(file_tags), None), True)
+    except Exception as e:
+        return ((path, {}, '%s: %s' % (type(e).__name__, e)), not isinstance(e, OSError))
+
+# process a list of paths in a worker process for process_paths, returning
+# the tuples of process_path_cacheable
+def process_path_list(paths, stop_tag, details, strict, tags):
+    return [process_path_cacheable(path, stop_tag, details, strict, tags) for path in paths]
+
+# number of results stored by an EXIF_cache between commits to its database
+CACHE_COMMIT_INTERVAL = 1000
+
+# persistent cache of the printable tags of image files in an SQLite database,
+# so unchanged files do not need to be opened again.  Entries are keyed on the
+# absolute path, size and modification time of the file and the options used
+# to process it, so the cache can be used from any directory.
+class EXIF_cache:
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS tags (path TEXT PRIMARY KEY, '
+                                'size INTEGER, mtime_ns INTEGER, options TEXT, tags TEXT, '
+                                'error TEXT)')
+        self.uncommitted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # look up the file at path processed with options (a tuple of the stop_tag,
+    # details, strict and tags arguments), returning a tuple of the key to store a
+    # result with and the (path, printable tags, error) result if it is cached
+    # and the file is unchanged, or None.  The key is None if the file cannot
+    # be found.
+    def get(self, path, options):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.misses += 1
+            return (None, None)
+        key = (stat.st_size, stat.st_mtime_ns, json.dumps(options))
+        row = self.connection.execute('SELECT size, mtime_ns, options, tags, error FROM tags '
+                                      'WHERE path = ?', (os.path.abspath(path),)).fetchone()
+        if row is None or row[:3] != key:
+            self.misses += 1
+            return (key, None)
+        self.hits += 1
+        return (key, (path, json.loads(row[3]), row[4]))
+
+    # store the result of processing the file at path with the key from get
+    def put(self, path, key, result):
+        self.connection.execute('INSERT OR REPLACE INTO tags VALUES (?, ?, ?, ?, ?, ?)',
+                                (os.path.abspath(path),) + key
+                                + (json.dumps(result[1]), result[2]))
+        self.uncommitted += 1
+        if self.uncommitted >= CACHE_COMMIT_INTERVAL:
+            self.commit()
+
+    # process the image file at path like process_path, using the cache
+    def process_path(self, path, stop_tag='UNDEF', details=True, strict=False, tags=None):
+        key, result = self.get(path, (stop_tag, details, strict,
+                                      None if tags is None else sorted(tags)))
+        if result is None:
+            result, cacheable = process_path_cacheable(path, stop_tag, details, strict, tags)
+            if key is not None and cacheable:
+                self.put(path, key, result)
+        return result
+
+    # remove the files which no longer exist from the cache, returning the
+    # number removed.  Paths which are not absolute cannot be found from any
+    # directory, so are removed too.
+    def evict_missing(self):
+        missing = [(path,) for path, in self.connection.execute('SELECT path FROM tags')
+                   if not (os.path.isabs(path) and os.path.exists(path))]
+        self.connection.executemany('DELETE FROM tags WHERE path = ?', missing)
+        self.commit()
+        return len(missing)
+
+    # return the fraction of lookups that have been served from the cache
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM tags').fetchone()[0]
+
+    def commit(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+# process the image files named in paths, walking any directories, across a
+# pool of workers processes (defaulting to the number of CPUs, or in this
+# process if workers is 1).  Generates the (path, printable tags, error)
+# tuples of process_path in the order of the files, as soon as each is
+# available, so a file that cannot be processed does not stop the others.
+# Unchanged files in cache, an optional EXIF_cache, are not processed again.
+def process_paths(paths, workers=None, stop_tag='UNDEF', details=True, strict=False,
+                  tags=None, cache=None):
+    workers = workers or os.cpu_count() or 1
+    options = (stop_tag, details, strict, None if tags is None else sorted(tags))
+    path_iter = walk_paths(paths)
+    chunks = iter(lambda: list(itertools.islice(path_iter, PATHS_PER_TASK)), [])
+    executor = futures.ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    # start processing a chunk of paths, returning the chunk, the cache
+    # lookups and a future for the results of the paths not in the cache
+    def submit(chunk):
+        lookups = [cache.get(path, options) if cache is not None else (None, None)
+                   for path in chunk]
+        misses = [path for path, (key, result) in zip(chunk, lookups) if result is None]
+        if executor:
+            return (chunk, lookups, executor.submit(process_path_list, misses, *options))
+        job = futures.Future()
+        job.set_result(process_path_list(misses, *options))
+        return (chunk, lookups, job)
+
+    # generate the results of a chunk in order, storing the new ones
+    def results(task):
+        chunk, lookups, job = task
+        processed = iter(job.result())
+        for path, (key, result) in zip(chunk, lookups):
+            if result is None:
+                result, cacheable = next(processed)
+                if key is not None and cacheable:
+                    cache.put(path, key, result)
+            yield result
+
+    # keep a limited number of tasks queued so memory use does not grow with
+    # the number of files
+    max_pending = workers * TASKS_PER_WORKER if executor else 1
+    pending = collections.deque()
+    try:
+        for chunk in chunks:
+            pending.append(submit(chunk))
+            if len(pending) >= max_pending:
+                for result in results(pending.popleft()):
+                    yield result
+        while pending:
+            for result in results(pending.popleft()):
+                yield result
+    finally:
+        for chunk, lookups, job in pending:
+            job.cancel()
+        if executor:
+            executor.shutdown()
+
+# convert a result of process_paths to a line of JSON
+def json_line(result):
+    path, tags, error = result
+    if error is None:
+        return json.dumps({'path': path, 'tags': tags}, sort_keys=True)
+    return json.dumps({'path': path, 'error': error}, sort_keys=True)
 
 # show command line usage
 def usage(exit_status):
-    msg = 'Usage: EXIF.py [OPTIONS] file1 [file2 ...]\n'
-    msg += 'Extract EXIF information from digital camera image files.\n\nOptions:\n'
+    msg = 'Usage: EXIF.py [OPTIONS] file1|dir1 [file2|dir2 ...]\n'
+    msg += 'Extract EXIF information from digital camera image files.\n'
+    msg += 'Directories are searched for image files.\n\nOptions:\n'
     msg += '-q --quick   Do not process MakerNotes.\n'
     msg += '-t TAG --stop-tag TAG   Stop processing when this tag is retrieved.\n'
     msg += '-s --strict   Run in strict mode (stop on errors).\n'
     msg += '-d --debug   Run in debug mode (display extra info).\n'
+    msg += '-j --json   Output a line of JSON for each file, processing the files\n'
+    msg += '            in parallel. Exits with status 1 if any file failed.\n'
+    msg += '-w N --workers N   Number of processes used with --json (default: one\n'
+    msg += '                   per CPU).\n'
+    msg += '--tags NAMES   Only extract these comma separated tags, such as\n'
+    msg += '               Image Orientation,EXIF DateTimeOriginal,GPS\n'
+    msg += '-c FILE --cache FILE   Cache the tags in this database with --json, so\n'
+    msg += '                       unchanged files are not processed again.\n'
+    msg += '-e --evict   Remove files that no longer exist from the --cache.\n'
     print(msg)
     sys.exit(exit_status)
 
@@ -1717,7 +2131,7 @@ if __name__ == '__main__':
 
     # parse command line options/arguments
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "hqsdt:v", ["help", "quick", "strict", "debug", "stop-tag="])
+        opts, args = getopt.getopt(sys.argv[1:], "hqsdt:vjw:c:e", ["help", "quick", "strict", "debug", "stop-tag=", "json", "workers=", "cache=", "evict", "tags="])
     except getopt.GetoptError:
         usage(2)
     if args == []:
@@ -1726,6 +2140,11 @@ if __name__ == '__main__':
     stop_tag = 'UNDEF'
     debug = False
     strict = False
+    json_output = False
+    workers = None
+    cache_filename = None
+    evict = False
+    tags = None
     for o, a in opts:
         if o in ("-h", "--help"):
             usage(0)
@@ -1737,9 +2156,40 @@ if __name__ == '__main__':
             strict = True
         if o in ("-d", "--debug"):
             debug = True
+        if o in ("-j", "--json"):
+            json_output = True
+        if o in ("-w", "--workers"):
+            try:
+                workers = int(a)
+            except ValueError:
+                usage(2)
+        if o in ("-c", "--cache"):
+            cache_filename = a
+        if o in ("-e", "--evict"):
+            evict = True
+        if o == "--tags":
+            tags = a.split(',')
+    # the cache is only used with --json, and eviction only with a cache
+    if (cache_filename and not json_output) or (evict and not cache_filename):
+        usage(2)
+
+    # output a line of JSON for each file, carrying on past any failures
+    if json_output:
+        failed = False
+        cache = EXIF_cache(cache_filename) if cache_filename else None
+        for result in process_paths(args, workers, stop_tag=stop_tag, details=detailed,
+                                    strict=strict, tags=tags, cache=cache):
+            print(json_line(result), flush=True)
+            failed = failed or result[2] is not None
+        if cache is not None:
+            evicted = cache.evict_missing() if evict else 0
+            sys.stderr.write('cache: %d hits, %d misses (%.1f%% hit rate), %d evicted\n'
+                             % (cache.hits, cache.misses, 100.0 * cache.hit_rate(), evicted))
+            cache.close()
+        sys.exit(1 if failed else 0)
 
     # output info for each file
-    for filename in args:
+    for filename in walk_paths(args):
         try:
             file=open(filename, 'rb')
         except:
@@ -1747,7 +2197,8 @@ if __name__ == '__main__':
             continue
         print(filename + ':')
         # get the tags
-        data = process_file(file, stop_tag=stop_tag, details=detailed, strict=strict, debug=debug)
+        data = process_file(file, stop_tag=stop_tag, details=detailed, strict=strict, debug=debug,
+                            tags=tags)
         if not data:
             print('No EXIF information found')
             continue
@@ -12,10 +12,40 @@ buy it."""
 # PublicPermissions: True
 #==============================================================
 
-from datetime import datetime, date, time, timedelta
-from math import sin, cos, tan, asin, acos, atan2, pi, floor
-from dateutil import tz
-from scipy import interpolate
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+import functools
+import importlib
+import math
+import os
+import struct
+from math import sin, cos, pi, floor, ceil
+
+
+class _LazyModule:
+    """A stand in for a module that is only imported when one of its attributes is first used,
+    keeping the import of this module fast for callers that don't need numpy or dateutil. Names
+    in aliases are mapped to different names in the module."""
+    def __init__(self, name, aliases=None):
+        self._name = name
+        self._aliases = aliases or {}
+
+    def __getattr__(self, attribute):
+        value = getattr(importlib.import_module(self._name),
+                        self._aliases.get(attribute, attribute))
+        # Store the value so future lookups don't reach __getattr__.
+        setattr(self, attribute, value)
+        return value
+
+np = _LazyModule('numpy')
+tz = _LazyModule('dateutil.tz')
+json = _LazyModule('json')
+futures = _LazyModule('concurrent.futures')
+# The numpy equivalents of the math functions used in this module, used when the inputs to a
+# calculation are numpy arrays rather than scalars.
+_array_math = _LazyModule('numpy', {'asin': 'arcsin', 'acos': 'arccos', 'atan2': 'arctan2'})
 
 # In many case we wish to use standard abbreviations that contain capitals or are less than
 # three characters, and align columns in the data matrices. Disable pylint warnings for these.
@@ -26,9 +56,108 @@ DEG_TO_RAD = pi / 180.0
 RAD_TO_DEG = 180.0 / pi
 TWO_PI = 2 * pi
 ONE_AU_IN_KM = 149597870.7
+EARTH_RADIUS_KM = 6378.14
+SUN_RADIUS_KM = 696000.0
+MOON_RADIUS_KM = 1737.4
+
+# Altitudes of the sun (in radians) commonly used with Body.altitude_crossings. The sun is in the
+# golden hour between the blue hour and golden hour altitudes and in the blue hour between the
+# civil twilight and blue hour altitudes.
+SUN_ALTITUDES = {
+    'horizon': -0.833 * DEG_TO_RAD,
+    'golden hour': 6.0 * DEG_TO_RAD,
+    'blue hour': -4.0 * DEG_TO_RAD,
+    'civil twilight': -6.0 * DEG_TO_RAD,
+    'nautical twilight': -12.0 * DEG_TO_RAD,
+    'astronomical twilight': -18.0 * DEG_TO_RAD,
+}
+
+# The principal phases of the moon, in order of increasing elongation from the sun.
+PRINCIPAL_PHASES = ('new', 'first quarter', 'full', 'last quarter')
 
 # Add to datetime.date.ordinal to calculate the Julian day.
 JD_OFFSET = 1721424.5
+# The Julian day at the start of the POSIX epoch, 1970-01-01 UTC.
+POSIX_EPOCH_JD = 2440587.5
+
+# Dates from which the difference between TAI and UTC changed, as (year, month, TAI-UTC in
+# seconds). From 1972 the difference between dynamical time and UTC (aka delta T) is exactly
+# TT_MINUS_TAI plus the current TAI-UTC. After the last leap second it is assumed to be unchanged,
+# since leap seconds are due to be discontinued by 2035.
+LEAP_SECONDS = (
+    (1972, 1, 10), (1972, 7, 11), (1973, 1, 12), (1974, 1, 13), (1975, 1, 14), (1976, 1, 15),
+    (1977, 1, 16), (1978, 1, 17), (1979, 1, 18), (1980, 1, 19), (1981, 7, 20), (1982, 7, 21),
+    (1983, 7, 22), (1985, 7, 23), (1988, 1, 24), (1990, 1, 25), (1991, 1, 26), (1992, 7, 27),
+    (1993, 7, 28), (1994, 7, 29), (1996, 1, 30), (1997, 7, 31), (1999, 1, 32), (2006, 1, 33),
+    (2009, 1, 34), (2012, 7, 35), (2015, 7, 36), (2017, 1, 37),
+)
+TT_MINUS_TAI = 32.184
+# Before 1972 delta T is interpolated from the Espenak-Meeus polynomials sampled once a year from
+# this year, before which it follows their long term parabola.
+DELTA_T_TABLE_START_YEAR = -500
+
+# The types of event calculated by Body.events, and the formats in which it can return them.
+EVENT_TYPES = ('rise', 'transit', 'set')
+EVENT_OUTPUTS = ('datetime', 'ut', 'datetime64')
+
+# Default maximum number of entries in the ephemeris cache.
+DEFAULT_CACHE_SIZE = 4096
+
+# The (segment length in days, polynomial degree) of the Chebyshev series used for each body in an
+# ephemeris table, chosen to keep the interpolation error well below 0.001 arcseconds.
+TABLE_SEGMENTS = {'Sun': (32.0, 13), 'Moon': (8.0, 15)}
+
+# Default number of days calculated at once by Body.iter_events, and the number of extra days
+# calculated each side of these chunks.
+DEFAULT_CHUNK_DAYS = 64
+CHUNK_MARGIN_DAYS = 6
+
+# Number of times per day the altitude is sampled to bracket crossings in Body.altitude_crossings,
+# and the number of bisection steps used to refine each crossing (giving a precision of well
+# under a second).
+ALTITUDE_SAMPLES_PER_DAY = 96
+ALTITUDE_BISECTION_STEPS = 24
+
+# Default maximum number of days and observers in each chunk of work calculated by
+# parallel_events.
+PARALLEL_CHUNK_DAYS = 366
+PARALLEL_CHUNK_OBSERVERS = 100
+
+# Number of Newton iterations used to refine the times of the moon's principal phases.
+MOON_PHASE_ITERATIONS = 6
+
+# The types of eclipse found by Moon.eclipses.
+ECLIPSE_TYPES = ('total solar', 'annular solar', 'partial solar',
+                 'total lunar', 'partial lunar', 'penumbral lunar')
+# New and full moons can only be eclipses when the sine of the moon's mean argument of latitude
+# is below this limit (pp380).
+ECLIPSE_LATITUDE_LIMIT = 0.36
+# Factor by which the earth's radius is enlarged to allow for its atmosphere when casting a
+# shadow, following Danjon.
+EARTH_SHADOW_ENLARGEMENT = 1.0 + 1.0 / 85.0
+# Number of iterations used to refine the time of greatest eclipse, and the step in days used to
+# estimate the derivatives.
+ECLIPSE_ITERATIONS = 3
+ECLIPSE_STEP_DAYS = 0.02
+
+# The smallest terms used in the position series at each precision, as a tuple of (sun series
+# amplitude in 1e-8 radians or AU, moon longitude and latitude coefficient in 1e-6 degrees, moon
+# distance coefficient in meters). The maximum errors relative to full precision over 1900-2100,
+# and the time per position relative to full precision (scalar, batched), are:
+#   arcsecond: sun 0.7" and 540 km, moon 1.7" and 52 km; sun 0.6x, 0.5x, moon 0.8x, 0.8x.
+#   arcminute: sun 37" and 11800 km, moon 47" and 320 km; sun 0.25x, 0.13x, moon 0.5x, 0.5x.
+# The moon's range errors move its parallax by under 0.5" and 3" respectively. Its longitude
+# terms are all larger than 1", so few of its terms can be dropped at arcsecond precision, and
+# at arcminute precision the next smallest terms each add about 5" for no measurable gain.
+PRECISION_CUTOFFS = {
+    'full': (0, 0, 0),
+    'arcsecond': (50, 150, 10000),
+    'arcminute': (5000, 1500, 100000),
+}
+
+# Maximum number of times evaluated together in the batched calculations, limiting the size of the
+# intermediate (times x series terms) matrices.
+ARRAY_CHUNK_SIZE = 4096
 
 
 # Define the sun and moon matrices, thanks to PJ Naughter (Web: www.naughter.com) for typing
@@ -271,6 +400,40 @@ R3 = (
 R4 = (( 4, 2.56, 6283.08 ),)
 
 
+def _pack_series(matrices):
+    """Packs a sequence of (amplitude, phase, frequency) matrices, one for each power of Tau, into
+    contiguous numpy arrays for the batched calculations, returning a tuple of (phases,
+    frequencies, amplitudes) where amplitudes has a column for each power of Tau."""
+    rows = [(order, row) for order, matrix in enumerate(matrices) for row in matrix]
+    amplitudes = np.zeros((len(rows), len(matrices)))
+    for i, (order, row) in enumerate(rows):
+        amplitudes[i, order] = row[0]
+    phases = np.array([row[1] for _, row in rows], dtype=float)
+    frequencies = np.array([row[2] for _, row in rows], dtype=float)
+    return (phases, frequencies, amplitudes)
+
+@functools.lru_cache(maxsize=None)
+def _sun_series(precision):
+    """Returns the L, B, and R series for a precision (see PRECISION_CUTOFFS) as a tuple of
+    three sequences of matrices, omitting the terms with amplitudes below the cutoff and the
+    matrices for the highest powers of Tau once they have no terms left."""
+    cutoff = PRECISION_CUTOFFS[precision][0]
+    series = []
+    for matrices in ((L0, L1, L2, L3, L4, L5), (B0, B1, B2, B3, B4), (R0, R1, R2, R3, R4)):
+        truncated = [tuple(row for row in matrix if abs(row[0]) >= cutoff) for matrix in matrices]
+        while not truncated[-1]:
+            truncated.pop()
+        series.append(tuple(truncated))
+    return tuple(series)
+
+
+@functools.lru_cache(maxsize=None)
+def _packed_sun_series(precision):
+    """Returns the packed L, B, and R series for a precision, created the first time they are
+    needed."""
+    return tuple(_pack_series(matrices) for matrices in _sun_series(precision))
+
+
 # Moon position data.
 
 arguments_LR = (
@@ -472,31 +635,398 @@ coefficients_B = (
 )
 
 
+@functools.lru_cache(maxsize=None)
+def _moon_series(precision):
+    """Returns the Moon position series for a precision (see PRECISION_CUTOFFS) as a tuple of the
+    longitude (sine), distance (cosine), and latitude (sine) terms, each a tuple of the multipliers
+    of (D, M, Mdash, F) and the coefficient, omitting the terms with zero coefficients or
+    coefficients below the cutoffs. The longitude and distance terms share their arguments in the
+    tables but are truncated separately."""
+    _, angle_cutoff, range_cutoff = PRECISION_CUTOFFS[precision]
+    return tuple(tuple(tuple(arg) + (coef,) for arg, coef in zip(arguments, coefficients)
+                       if coef != 0 and abs(coef) >= cutoff)
+                 for arguments, coefficients, cutoff in (
+                     (arguments_LR, [coef[0] for coef in coefficients_LR], angle_cutoff),
+                     (arguments_LR, [coef[1] for coef in coefficients_LR], range_cutoff),
+                     (arguments_B, coefficients_B, angle_cutoff)))
+
+
+@functools.lru_cache(maxsize=None)
+def _packed_moon_series(precision):
+    """Returns the Moon position series for a precision packed into numpy arrays for the batched
+    calculations, created the first time they are needed, as a tuple of (arguments, E_powers,
+    coefficients) for each of the longitude, distance, and latitude series. Each row of the
+    argument matrices gives the multipliers of (D, M, Mdash, F) for one term, so the arguments
+    for many times are a single matrix product. The power of E applied to each term is abs(M)."""
+    packed = []
+    for terms in _moon_series(precision):
+        packed_terms = np.array(terms, dtype=float).reshape(-1, 5)
+        packed.append((packed_terms[:, :4], np.abs(packed_terms[:, 1]), packed_terms[:, 4]))
+    return tuple(packed)
+
+
+def _math_for(value):
+    """Returns the math module if value is a scalar, or the numpy equivalents if it is an array."""
+    return math if isinstance(value, (float, int)) else _array_math
+
+
+def _sum_series_array(packed, Tau):
+    """Evaluates one packed series (see _pack_series) at each element of a numpy array of times
+    in millenia, returning an array of sums."""
+    phases, frequencies, amplitudes = packed
+    powers = Tau[:, np.newaxis] ** np.arange(amplitudes.shape[1])
+    total = np.empty_like(Tau)
+    for start in range(0, len(Tau), ARRAY_CHUNK_SIZE):
+        chunk = slice(start, start + ARRAY_CHUNK_SIZE)
+        terms = np.cos(phases + np.outer(Tau[chunk], frequencies))
+        total[chunk] = np.einsum('ij,ij->i', terms @ amplitudes, powers[chunk])
+    return total / 1e8
+
+
+def _sum_lunar_series_array(D, M, Mdash, F, E, precision):
+    """Evaluates the lunar longitude, distance, and latitude series for a precision at each
+    element of numpy arrays of the fundamental arguments, returning a tuple of (sigmaL, sigmaR,
+    sigmaB) arrays."""
+    sums = []
+    fundamentals = np.stack((D, M, Mdash, F), axis=1)
+    for (packed_arguments, E_powers, coefficients), function in zip(
+            _packed_moon_series(precision), (np.sin, np.cos, np.sin)):
+        total = np.empty_like(D)
+        for start in range(0, len(D), ARRAY_CHUNK_SIZE):
+            chunk = slice(start, start + ARRAY_CHUNK_SIZE)
+            args = fundamentals[chunk] @ packed_arguments.T
+            total[chunk] = (E[chunk, np.newaxis] ** E_powers * function(args)) @ coefficients
+        sums.append(total)
+    return tuple(sums)
+
+
+class EphemerisCache:
+    """A bounded cache of position and nutation results keyed on the calculation, body, and
+    dynamical time, evicting the least recently used entries once max_size is reached. Tracks
+    the number of hits and misses to help size the cache."""
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key):
+        """Returns the cached value for key, or None if it is not in the cache."""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        """Adds a value to the cache, evicting the least recently used entries if full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all entries from the cache and resets the hit and miss counts."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        """Returns the fraction of lookups that have been served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+_ephemeris_cache = EphemerisCache()
+
+
+def get_ephemeris_cache():
+    """Returns the ephemeris cache currently in use, or None if caching is disabled."""
+    return _ephemeris_cache
+
+
+def set_ephemeris_cache(cache):
+    """Sets the ephemeris cache used by all position and nutation calculations, returning the
+    previous cache. cache may be an EphemerisCache or any other object with the same lookup and
+    store methods, or None to disable caching. Note that cached coordinates are shared between
+    callers and should not be modified."""
+    global _ephemeris_cache # pylint: disable=global-statement
+    previous = _ephemeris_cache
+    _ephemeris_cache = cache
+    return previous
+
+
+def _cache_key(function, args):
+    """Returns the ephemeris cache key for a call to function with args, using the cache key of
+    any body in place of the body itself."""
+    return (function.__name__,) + tuple(arg._cache_key() if isinstance(arg, Body) else arg
+                                        for arg in args)
+
+
+def _memoize(function):
+    """Decorator for functions and methods whose last argument is a dynamical time, which stores
+    their results in the ephemeris cache when that time is a scalar. Batched calculations are not
+    cached, as they are cheaper per time than looking each time up, and the times refined by the
+    event searches would otherwise push out the entries worth keeping. The midnights the event
+    calculations start from are cached by Body._midnight_positions instead."""
+    @functools.wraps(function)
+    def wrapper(*args):
+        cache = _ephemeris_cache
+        if cache is None or not isinstance(args[-1], (float, int)):
+            return function(*args)
+        key = _cache_key(function, args)
+        value = cache.lookup(key)
+        if value is None:
+            value = function(*args)
+            cache.store(key, value)
+        return value
+    return wrapper
+
+
+_ephemeris_table = None
+
+
+def use_ephemeris_table(path):
+    """Serves the positions of the sun and moon from the EphemerisTable stored at path whenever it
+    covers the requested times, returning True if the table was loaded or False if path does not
+    exist. Pass None to stop using a table."""
+    global _ephemeris_table # pylint: disable=global-statement
+    if path is None:
+        _ephemeris_table = None
+        return False
+    if not os.path.exists(path):
+        return False
+    _ephemeris_table = EphemerisTable(path)
+    return True
+
+
+@contextmanager
+def _direct_calculation():
+    """Context manager which disables the ephemeris table and cache, so positions are calculated
+    directly from the series."""
+    global _ephemeris_table # pylint: disable=global-statement
+    previous_table = _ephemeris_table
+    previous_cache = set_ephemeris_cache(None)
+    _ephemeris_table = None
+    try:
+        yield
+    finally:
+        _ephemeris_table = previous_table
+        set_ephemeris_cache(previous_cache)
+
+
+def _tabulated(function):
+    """Decorator for geocentric position methods which serves the positions from the ephemeris
+    table in use, if any, when it covers all the requested times."""
+    @functools.wraps(function)
+    def wrapper(self, dt):
+        table = _ephemeris_table
+        if table is not None and table.covers(type(self).__name__,
+                                              dt.dt if isinstance(dt, Epoch) else dt):
+            return table.position(type(self).__name__, dt)
+        return function(self, dt)
+    return wrapper
+
+
+def _chebyshev(coefficients, x):
+    """Evaluates Chebyshev series using Clenshaw's recurrence at x in the range [-1, 1], where
+    the coefficients are along the last axis of a numpy array and x broadcasts against the
+    remaining axes."""
+    b1 = b2 = 0.0
+    for k in range(coefficients.shape[-1] - 1, 0, -1):
+        b1, b2 = coefficients[..., k] + 2.0 * x * b1 - b2, b1
+    return coefficients[..., 0] + x * b1 - b2
+
+
+def _chebyshev_scalar(coefficients, x):
+    """Evaluates a Chebyshev series from a sequence of coefficients at the scalar x in the range
+    [-1, 1] using Clenshaw's recurrence, avoiding the overhead of numpy for a single value."""
+    b1 = b2 = 0.0
+    for c in reversed(coefficients[1:]):
+        b1, b2 = c + 2.0 * x * b1 - b2, b1
+    return coefficients[0] + x * b1 - b2
+
+
+_fixed_delta_t = None
+
+# The universal times at which each of LEAP_SECONDS took effect.
+_LEAP_SECOND_UTS = tuple(date(year, month, 1).toordinal() + JD_OFFSET
+                         for year, month, _ in LEAP_SECONDS)
+
+
+def set_delta_t(seconds):
+    """Uses a fixed difference in seconds between dynamical time and universal time (for example
+    69.184 for 2017 onwards) in place of the delta T model, returning the previous fixed value.
+    Pass None to return to the model."""
+    global _fixed_delta_t # pylint: disable=global-statement
+    previous = _fixed_delta_t
+    _fixed_delta_t = seconds
+    return previous
+
+
+def _espenak_meeus_delta_t(year):
+    """Returns delta T in seconds for a decimal year using the polynomial expressions of Espenak and
+    Meeus, as published in the NASA Five Millennium Canon of Solar Eclipses."""
+    if year < -500 or year >= 2150:
+        return -20.0 + 32.0 * ((year - 1820.0) / 100.0)**2
+    if year < 500:
+        u = year / 100.0
+        return (10583.6 - 1014.41 * u + 33.78311 * u**2 - 5.952053 * u**3 - 0.1798452 * u**4
+                + 0.022174192 * u**5 + 0.0090316521 * u**6)
+    if year < 1600:
+        u = (year - 1000.0) / 100.0
+        return (1574.2 - 556.01 * u + 71.23472 * u**2 + 0.319781 * u**3 - 0.8503463 * u**4
+                - 0.005050998 * u**5 + 0.0083572073 * u**6)
+    if year < 1700:
+        t = year - 1600.0
+        return 120.0 - 0.9808 * t - 0.01532 * t**2 + t**3 / 7129.0
+    if year < 1800:
+        t = year - 1700.0
+        return (8.83 + 0.1603 * t - 0.0059285 * t**2 + 0.00013336 * t**3 - t**4 / 1174000.0)
+    if year < 1860:
+        t = year - 1800.0
+        return (13.72 - 0.332447 * t + 0.0068612 * t**2 + 0.0041116 * t**3 - 0.00037436 * t**4
+                + 0.0000121272 * t**5 - 0.0000001699 * t**6 + 0.000000000875 * t**7)
+    if year < 1900:
+        t = year - 1860.0
+        return (7.62 + 0.5737 * t - 0.251754 * t**2 + 0.01680668 * t**3 - 0.0004473624 * t**4
+                + t**5 / 233174.0)
+    if year < 1920:
+        t = year - 1900.0
+        return -2.79 + 1.494119 * t - 0.0598939 * t**2 + 0.0061966 * t**3 - 0.000197 * t**4
+    if year < 1941:
+        t = year - 1920.0
+        return 21.20 + 0.84493 * t - 0.076100 * t**2 + 0.0020936 * t**3
+    if year < 1961:
+        t = year - 1950.0
+        return 29.07 + 0.407 * t - t**2 / 233.0 + t**3 / 2547.0
+    if year < 1986:
+        t = year - 1975.0
+        return 45.45 + 1.067 * t - t**2 / 260.0 - t**3 / 718.0
+    if year < 2005:
+        t = year - 2000.0
+        return (63.86 + 0.3345 * t - 0.060374 * t**2 + 0.0017275 * t**3 + 0.000651814 * t**4
+                + 0.00002373599 * t**5)
+    if year < 2050:
+        t = year - 2000.0
+        return 62.92 + 0.32217 * t + 0.005589 * t**2
+    return -20.0 + 32.0 * ((year - 1820.0) / 100.0)**2 - 0.5628 * (2150.0 - year)
+
+
+@functools.lru_cache(maxsize=None)
+def _delta_t_table():
+    """Returns a list of the Espenak-Meeus delta T at the start of each year from
+    DELTA_T_TABLE_START_YEAR to the first leap second, created the first time it is needed."""
+    return [_espenak_meeus_delta_t(float(year))
+            for year in range(DELTA_T_TABLE_START_YEAR, LEAP_SECONDS[0][0] + 1)]
+
+
+@functools.lru_cache(maxsize=None)
+def _delta_t_arrays():
+    """Returns the delta T table, the leap second times, and the TAI-UTC from each leap second as
+    numpy arrays for the batched lookup."""
+    return (np.array(_delta_t_table()), np.array(_LEAP_SECOND_UTS),
+            np.array([tai_utc for _, _, tai_utc in LEAP_SECONDS], dtype=float))
+
+
+def delta_t(ut):
+    """Returns the difference in seconds between dynamical time and universal time (aka delta T)
+    at a universal time in days, using the leap seconds from 1972 and a table of the
+    Espenak-Meeus model before then, unless a fixed value has been set with set_delta_t. ut may
+    also be a numpy array, in which case the result is an array."""
+    fixed = _fixed_delta_t
+    if isinstance(ut, (float, int)):
+        if fixed is not None:
+            return float(fixed)
+        if ut >= _LEAP_SECOND_UTS[0]:
+            return TT_MINUS_TAI + LEAP_SECONDS[bisect_right(_LEAP_SECOND_UTS, ut) - 1][2]
+        # Decimal years from the start of the table.
+        position = (ut - 2451544.5) / 365.2425 + 2000.0 - DELTA_T_TABLE_START_YEAR
+        if position < 0.0:
+            return _espenak_meeus_delta_t(position + DELTA_T_TABLE_START_YEAR)
+        table = _delta_t_table()
+        index = int(position)
+        return table[index] + (table[index + 1] - table[index]) * (position - index)
+
+    ut = np.asarray(ut, dtype=float)
+    if fixed is not None:
+        return np.full(ut.shape, float(fixed))
+    table, leap_second_uts, tai_utcs = _delta_t_arrays()
+    position = (ut - 2451544.5) / 365.2425 + 2000.0 - DELTA_T_TABLE_START_YEAR
+    index = np.clip(np.floor(position), 0, len(table) - 2).astype(int)
+    result = table[index] + (table[index + 1] - table[index]) * (position - index)
+    early = position < 0.0
+    if early.any():
+        result[early] = [_espenak_meeus_delta_t(year + DELTA_T_TABLE_START_YEAR)
+                         for year in position[early].tolist()]
+    leap_index = np.searchsorted(leap_second_uts, ut, side='right') - 1
+    return np.where(leap_index >= 0, TT_MINUS_TAI + tai_utcs[np.maximum(leap_index, 0)], result)
+
+
 def ut_to_dt(ut):
-    """Converts a universal time in days to a dynamical time in days."""
-    # As at July 2020, TAI is 37 sec ahead of UTC, TDT is 32.184 seconds ahead of TAI.
-    return ut + 69.184/SEC_IN_DAY
+    """Converts a universal time in days to a dynamical time in days. ut may also be a numpy
+    array, in which case the result is an array."""
+    return ut + delta_t(ut) / SEC_IN_DAY
+
+
+def dt_to_ut(dt):
+    """Converts a dynamical time in days to a universal time in days. dt may also be a numpy
+    array, in which case the result is an array."""
+    # Delta T changes slowly enough that a second evaluation at the approximate universal time
+    # is sufficient, except within a minute of a leap second.
+    return dt - delta_t(dt - delta_t(dt) / SEC_IN_DAY) / SEC_IN_DAY
 
 
 def ut_to_datetime(ut):
-    """Convert a universal time in days to a UTC datetime.datetime object."""
-    days_after_origin = ut - JD_OFFSET
-    return (datetime.combine(date.fromordinal(floor(days_after_origin)), time.min, tzinfo=tz.UTC)
-            + timedelta(days=1) * (days_after_origin % 1.0))
+    """Convert a universal time in days to a UTC datetime.datetime object, rounded to the nearest
+    microsecond."""
+    return (datetime(1970, 1, 1, tzinfo=tz.UTC)
+            + timedelta(microseconds=round((ut - POSIX_EPOCH_JD) * SEC_IN_DAY * 1e6)))
 
 
 def datetime_to_ut(datetime_object):
     """Convert a tzaware datetime.datetime object to a universal time in days."""
-    utc = datetime_object.astimezone(tz.UTC)
-    days = utc.date().toordinal()
-    fraction = (utc - datetime.combine(utc.date(), time.min, tz.UTC)) / timedelta(days=1)
-    return JD_OFFSET + days + fraction
+    return POSIX_EPOCH_JD + datetime_object.timestamp() / SEC_IN_DAY
+
+
+def ut_to_posix(ut):
+    """Converts a universal time in days to a POSIX timestamp in seconds. ut may also be a numpy
+    array, in which case the result is an array."""
+    return (ut - POSIX_EPOCH_JD) * SEC_IN_DAY
+
+
+def posix_to_ut(timestamp):
+    """Converts a POSIX timestamp in seconds to a universal time in days. timestamp may also be a
+    numpy array, in which case the result is an array."""
+    return POSIX_EPOCH_JD + timestamp / SEC_IN_DAY
+
+
+def ut_to_datetime64(uts):
+    """Converts a numpy array of universal times in days to a numpy array of UTC datetime64 values
+    with microsecond resolution, matching ut_to_datetime."""
+    microseconds = np.round((np.asarray(uts, dtype=float) - POSIX_EPOCH_JD) * SEC_IN_DAY * 1e6)
+    return np.datetime64(0, 'us') + microseconds.astype('timedelta64[us]')
+
 
+def datetime64_to_ut(values):
+    """Converts a numpy array of UTC datetime64 values to a numpy array of universal times in
+    days."""
+    values = np.asarray(values, dtype='datetime64[us]')
+    return POSIX_EPOCH_JD + (values - np.datetime64(0, 'us')) / np.timedelta64(1, 'D')
 
+
+@_memoize
 def nutation(dt):
     """Return deltas_psi, mean_obliquity, and true_obliquity for the Earth's nutation at a
-    given dynamical time."""
+    given dynamical time. dt may also be a numpy array, in which case each element of the result
+    is an array."""
     # Astromonical Algorithms pp147
+    m = _math_for(dt)
 
     # Time in centuries
     T = (dt - 2451545.0)/36525.0
@@ -507,28 +1037,66 @@ def nutation(dt):
     # Mean longitude of the moon
     L_dash = (218.3165 + 481267.8813 * T) * DEG_TO_RAD
     # Nutation in longitude
-    delta_psi = (-17.20 * sin(omega) - 1.32 * sin(2.0 * L) - 0.23 * sin(2.0 * L_dash)
-                 + 0.21 * sin(2 * omega)) * DEG_TO_RAD / 3600.0
+    delta_psi = (-17.20 * m.sin(omega) - 1.32 * m.sin(2.0 * L) - 0.23 * m.sin(2.0 * L_dash)
+                 + 0.21 * m.sin(2 * omega)) * DEG_TO_RAD / 3600.0
     # Mean obliquity of the ecliptic
     mean_obliquity = (23.43929111111 - 0.01300416667 * T - 1.638888889e-7 * T * T
                       + 5.03611111e-7 * T * T * T) * DEG_TO_RAD
     # Nutation in obliquity
-    nut_obl = (9.2 * cos(omega) + 0.57 * cos(2.0 * L) + 0.1 * cos(2.0 * L_dash)
-               - 0.09 * cos(2 * omega)) * DEG_TO_RAD / 3600.0
+    nut_obl = (9.2 * m.cos(omega) + 0.57 * m.cos(2.0 * L) + 0.1 * m.cos(2.0 * L_dash)
+               - 0.09 * m.cos(2 * omega)) * DEG_TO_RAD / 3600.0
     true_obliquity = mean_obliquity + nut_obl
 
     return (delta_psi, mean_obliquity, true_obliquity)
 
 
-def greenwich_sidereal_time(ut):
-    """Returns the Greewich sidereal time for a specified universal time."""
+class Epoch:
+    """The quantities shared by the position, sidereal time, and event calculations at a dynamical
+    time, so they are calculated once for each instant: the time in centuries from J2000 (T) and
+    the nutation (delta_psi, mean_obliquity, and true_obliquity). dt may also be a numpy array,
+    in which case each attribute is an array and the epoch may be indexed like one."""
+    def __init__(self, dt):
+        if not isinstance(dt, (float, int)):
+            dt = np.asarray(dt, dtype=float)
+        self.dt = dt
+        self.T = (dt - 2451545.0) / 36525.0
+        self.delta_psi, self.mean_obliquity, self.true_obliquity = nutation(dt)
+
+    @classmethod
+    def of(cls, dt):
+        """Returns dt if it is already an Epoch, otherwise the Epoch for the dynamical time dt."""
+        return dt if isinstance(dt, cls) else cls(dt)
+
+    @classmethod
+    def from_nutation(cls, dt, delta_psi, mean_obliquity, true_obliquity):
+        """Returns the Epoch for the dynamical time dt with an already calculated nutation."""
+        epoch = object.__new__(cls)
+        epoch.dt = dt
+        epoch.T = (dt - 2451545.0) / 36525.0
+        epoch.delta_psi = delta_psi
+        epoch.mean_obliquity = mean_obliquity
+        epoch.true_obliquity = true_obliquity
+        return epoch
+
+    def __getitem__(self, index):
+        epoch = object.__new__(Epoch)
+        for name in ('dt', 'T', 'delta_psi', 'mean_obliquity', 'true_obliquity'):
+            setattr(epoch, name, getattr(self, name)[index])
+        return epoch
+
+
+def greenwich_sidereal_time(ut, epoch=None):
+    """Returns the Greewich sidereal time for a specified universal time. ut may also be a numpy
+    array, in which case the result is an array. epoch may supply the Epoch for the dynamical
+    time corresponding to ut to reuse its nutation."""
     # pp88 Astronomical Algorithms
+    m = _math_for(ut)
 
     # Equation 12.4 was not maintaining sufficient numeric precision
     # so need to calculate the sidereal time at midnight and then offset
 
     # Julian day at midnight.
-    day = floor(ut - 0.5) + 0.5
+    day = m.floor(ut - 0.5) + 0.5
     # Fraction of the day.
     frac = (ut - 0.5) % 1.0
     # Time in centuries
@@ -539,14 +1107,60 @@ def greenwich_sidereal_time(ut):
     theta0 += 1.00273790935 * frac * TWO_PI
 
     # Get nutation and correct to apparent (pp144)
-    delta_psi, _, epsilon = nutation(ut_to_dt(ut))
-    theta0 = (theta0 + delta_psi * cos(epsilon)) % TWO_PI
+    if epoch is None:
+        epoch = Epoch(ut_to_dt(ut))
+    theta0 = (theta0 + epoch.delta_psi * m.cos(epoch.true_obliquity)) % TWO_PI
     return theta0
 
 
+def _altitude(ut, ra, decl, observer):
+    """Returns the altitude of a body with the supplied equatorial coordinates at a universal
+    time, as seen by observer. Works equally on scalars and numpy arrays."""
+    # pp93 Astronomical Algorithms
+    m = _math_for(ut)
+    H = greenwich_sidereal_time(ut) - observer.lng - ra
+    return m.asin(m.sin(observer.lat) * m.sin(decl)
+                  + m.cos(observer.lat) * m.cos(decl) * m.cos(H))
+
+
+def _cartesian(spherical):
+    """Returns a numpy array of the cartesian coordinates in km of each of a batch of spherical
+    coordinates along its last axis."""
+    cos_lat = np.cos(spherical.lat)
+    return np.stack((spherical.rng * cos_lat * np.cos(spherical.lng),
+                     spherical.rng * cos_lat * np.sin(spherical.lng),
+                     spherical.rng * np.sin(spherical.lat)), axis=-1)
+
+
+def _horizontal(ut, ra, decl, observer, epoch=None):
+    """Returns a tuple of the geometric (altitude, azimuth) of a body with the supplied equatorial
+    coordinates at a universal time as seen by observer, with azimuth measured eastward from
+    north. epoch may supply the Epoch for ut. Works equally on scalars and numpy arrays."""
+    # pp93 Astronomical Algorithms, which measures azimuth westward from south.
+    m = _math_for(ut)
+    H = greenwich_sidereal_time(ut, epoch) - observer.lng - ra
+    altitude = m.asin(m.sin(observer.lat) * m.sin(decl)
+                      + m.cos(observer.lat) * m.cos(decl) * m.cos(H))
+    azimuth = (m.atan2(m.sin(H), m.cos(H) * m.sin(observer.lat) - m.tan(decl) * m.cos(observer.lat))
+               + pi) % TWO_PI
+    return (altitude, azimuth)
+
+
+def _refraction(altitude):
+    """Returns the atmospheric refraction in radians for a body at each geometric altitude in a
+    numpy array of radians, for standard pressure and temperature. There is no refraction below
+    -1 degree where the formula is no longer meaningful."""
+    # pp106 Astronomical Algorithms, with the correction to give zero refraction at the zenith.
+    h = np.maximum(altitude * RAD_TO_DEG, -1.0)
+    refraction = (1.02 / np.tan((h + 10.3 / (h + 5.11)) * DEG_TO_RAD) + 0.0019279) / 60.0
+    return np.where(altitude >= -DEG_TO_RAD, refraction * DEG_TO_RAD, 0.0)
+
+
 class SphericalCoordinate:
     """A spherical coordinate, expressed as latitude and longitude in radians with an optional
-    range in kilometers."""
+    range in kilometers. Batched calculations use SphericalCoordinates."""
+    __slots__ = ('lat', 'lng', 'rng')
+
     def __init__(self, latitude, longitude, range_km=None):
         self.lat = latitude
         self.lng = longitude
@@ -555,29 +1169,154 @@ class SphericalCoordinate:
     def to_equatorial(self, epsilon):
         """Returns a corresponding EquatorialCoordinate, given the obliquity (epsilon)
         from a nutation calculation."""
-        ra = atan2(sin(self.lng) * cos(epsilon) - tan(self.lat) * sin(epsilon), cos(self.lng))
-        decl = asin(sin(self.lat) * cos(epsilon) + cos(self.lat) * sin(epsilon) * sin(self.lng))
+        m = _math_for(self.lat)
+        ra = m.atan2(m.sin(self.lng) * m.cos(epsilon) - m.tan(self.lat) * m.sin(epsilon),
+                     m.cos(self.lng))
+        decl = m.asin(m.sin(self.lat) * m.cos(epsilon)
+                      + m.cos(self.lat) * m.sin(epsilon) * m.sin(self.lng))
         return EquatorialCoordinate(ra, decl)
 
 
+class SphericalCoordinates(SphericalCoordinate):
+    """A batch of spherical coordinates, stored as a numpy array for each element rather than an
+    object for each coordinate. Indexing with an integer returns a SphericalCoordinate and with a
+    slice or array returns a smaller batch."""
+    __slots__ = ()
+
+    def __init__(self, latitude, longitude, range_km=None):
+        super(SphericalCoordinates, self).__init__(
+            np.asarray(latitude, dtype=float), np.asarray(longitude, dtype=float),
+            None if range_km is None else np.asarray(range_km, dtype=float))
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getitem__(self, index):
+        rng = None if self.rng is None else self.rng[index]
+        if np.ndim(self.lat[index]) == 0:
+            return SphericalCoordinate(float(self.lat[index]), float(self.lng[index]),
+                                       None if rng is None else float(rng))
+        return SphericalCoordinates(self.lat[index], self.lng[index], rng)
+
+    def to_equatorial(self, epsilon):
+        """Returns the corresponding EquatorialCoordinates, given the obliquity (epsilon) from a
+        nutation calculation as a scalar or a numpy array."""
+        equatorial = super(SphericalCoordinates, self).to_equatorial(epsilon)
+        return EquatorialCoordinates(equatorial.ra, equatorial.decl)
+
+
 class EquatorialCoordinate:
-    """An equatorial coordinate, expressed as declination and right ascension in radians."""
+    """An equatorial coordinate, expressed as declination and right ascension in radians. Batched
+    calculations use EquatorialCoordinates."""
+    __slots__ = ('ra', 'decl')
+
     def __init__(self, right_ascension, declination):
         self.ra = right_ascension
         self.decl = declination
 
 
+class EquatorialCoordinates(EquatorialCoordinate):
+    """A batch of equatorial coordinates, stored as a numpy array for each element rather than an
+    object for each coordinate. Indexing with an integer returns an EquatorialCoordinate and with
+    a slice or array returns a smaller batch."""
+    __slots__ = ()
+
+    def __init__(self, right_ascension, declination):
+        super(EquatorialCoordinates, self).__init__(np.asarray(right_ascension, dtype=float),
+                                                    np.asarray(declination, dtype=float))
+
+    def __len__(self):
+        return len(self.ra)
+
+    def __getitem__(self, index):
+        if np.ndim(self.ra[index]) == 0:
+            return EquatorialCoordinate(float(self.ra[index]), float(self.decl[index]))
+        return EquatorialCoordinates(self.ra[index], self.decl[index])
+
+
 class Interpolator:
-    """A convenient object oriented wrapper around the cubic interpolation provided by scipy."""
+    """A cubic spline interpolator, matching the interpolating spline with not-a-knot end
+    conditions that scipy's splrep would produce (or a quadratic or linear polynomial for three
+    or two points). The coefficients of each segment are calculated once at construction so
+    evaluation is a table lookup and a cubic polynomial."""
     def __init__(self, x_values, y_values):
-        self.interp = interpolate.splrep(x_values, y_values, k=min(3, len(x_values)-1))
+        self.x_values = [float(x) for x in x_values]
+        y_values = [float(y) for y in y_values]
+        slopes = self._spline_slopes(self.x_values, y_values)
+
+        # Store the coefficients of a cubic in (x - x_i) for each segment, in order of decreasing
+        # power to suit Horner's method.
+        self.coefficients = []
+        for i in range(len(self.x_values) - 1):
+            dx = self.x_values[i + 1] - self.x_values[i]
+            slope = (y_values[i + 1] - y_values[i]) / dx
+            self.coefficients.append(((slopes[i] + slopes[i + 1] - 2.0 * slope) / (dx * dx),
+                                      (3.0 * slope - 2.0 * slopes[i] - slopes[i + 1]) / dx,
+                                      slopes[i],
+                                      y_values[i]))
+        self._x_array = np.array(self.x_values)
+        self._coefficient_array = np.array(self.coefficients).T
+
+    @staticmethod
+    def _spline_slopes(x, y):
+        """Returns the first derivative at each x of the not-a-knot cubic spline through (x, y)."""
+        n = len(x)
+        dx = [x[i + 1] - x[i] for i in range(n - 1)]
+        slope = [(y[i + 1] - y[i]) / dx[i] for i in range(n - 1)]
+        if n == 2:
+            return [slope[0], slope[0]]
+
+        # Build the tridiagonal system relating the slopes, as lists of the sub, main, and super
+        # diagonal and the right hand side.
+        sub = [0.0] * n
+        diag = [0.0] * n
+        sup = [0.0] * n
+        rhs = [0.0] * n
+        for i in range(1, n - 1):
+            sub[i] = dx[i]
+            diag[i] = 2.0 * (dx[i - 1] + dx[i])
+            sup[i] = dx[i - 1]
+            rhs[i] = 3.0 * (dx[i] * slope[i - 1] + dx[i - 1] * slope[i])
+        if n == 3:
+            # Three points with not-a-knot conditions define a single parabola.
+            diag[0], sup[0], rhs[0] = 1.0, 1.0, 2.0 * slope[0]
+            sub[-1], diag[-1], rhs[-1] = 1.0, 1.0, 2.0 * slope[-1]
+        else:
+            d = x[2] - x[0]
+            diag[0], sup[0] = dx[1], d
+            rhs[0] = ((dx[0] + 2.0 * d) * dx[1] * slope[0] + dx[0] ** 2 * slope[1]) / d
+            d = x[-1] - x[-3]
+            sub[-1], diag[-1] = d, dx[-2]
+            rhs[-1] = (dx[-1] ** 2 * slope[-2] + (2.0 * d + dx[-1]) * dx[-2] * slope[-1]) / d
+
+        # Solve using the Thomas algorithm.
+        for i in range(1, n):
+            factor = sub[i] / diag[i - 1]
+            diag[i] -= factor * sup[i - 1]
+            rhs[i] -= factor * rhs[i - 1]
+        slopes = [0.0] * n
+        slopes[-1] = rhs[-1] / diag[-1]
+        for i in range(n - 2, -1, -1):
+            slopes[i] = (rhs[i] - sup[i] * slopes[i + 1]) / diag[i]
+        return slopes
 
     def at(self, x):
-        """Returns the interpolated y value at position x."""
-        return interpolate.splev([x], self.interp)[0]
-
-
-class AngularInterpolator:
+        """Returns the interpolated y value at position x, where x may also be a numpy array.
+        Values outside the range of x are extrapolated from the first or last segment."""
+        if isinstance(x, (float, int)):
+            i = min(max(bisect_right(self.x_values, x) - 1, 0), len(self.coefficients) - 1)
+            a, b, c, d = self.coefficients[i]
+            t = x - self.x_values[i]
+            return ((a * t + b) * t + c) * t + d
+        x = np.asarray(x, dtype=float)
+        i = np.clip(np.searchsorted(self._x_array, x, side='right') - 1,
+                    0, len(self.coefficients) - 1)
+        a, b, c, d = self._coefficient_array[:, i]
+        t = x - self._x_array[i]
+        return ((a * t + b) * t + c) * t + d
+
+
+class AngularInterpolator(Interpolator):
     """A cubic interpolator over y values that have be folded into the range [0, 2*PI>."""
     def __init__(self, x_values, y_values):
         # Need to unfold any y values that look like they span the max or min limit.
@@ -589,117 +1328,268 @@ class AngularInterpolator:
                 while y - clean_y_values[-1] > pi:
                     y -= 2*pi
             clean_y_values.append(y)
-        self.interp = interpolate.splrep(x_values, clean_y_values, k=min(3, len(x_values)-1))
+        super().__init__(x_values, clean_y_values)
 
     def at(self, x):
-        """Returns the interpolated y value at position x."""
-        return interpolate.splev([x], self.interp)[0] % TWO_PI
+        """Returns the interpolated y value at position x, where x may also be a numpy array."""
+        return super().at(x) % TWO_PI
 
 
 class Body:
-    """General calculations for an astronomical body."""
-    def __init__(self, apparent_altitude):
+    """General calculations for an astronomical body. precision selects how many terms of the
+    position series are used, trading accuracy for speed (see PRECISION_CUTOFFS)."""
+    def __init__(self, apparent_altitude, precision='full'):
+        if precision not in PRECISION_CUTOFFS:
+            raise ValueError('Unknown precision: {}'.format(precision))
         # The apparent altitude at which the body sets and rises, in radians.
         self.apparent_altitude = apparent_altitude
+        self.precision = precision
+
+    def _cache_key(self):
+        """Returns a hashable value identifying positions of this body in the ephemeris cache."""
+        return (type(self).__name__, self.precision)
 
-    def events(self, min_date, max_date, observer):
+    def events(self, min_date, max_date, observer, output='datetime'):
         """Calculates the rise, transit, and set times within the specified UTC dates using the
-        latitude and longitude supplied in observer, returning as a list of (datetime, event_type)
-        tuples where event_type is 'rise', 'transit', or 'set' and all datetimes are in UTC."""
+        latitude and longitude supplied in observer. By default returns a list of
+        (datetime, event_type) tuples where event_type is 'rise', 'transit', or 'set' and all
+        datetimes are in UTC. For bulk calculations output may be 'ut' or 'datetime64' to instead
+        return a tuple of (times, event types) numpy arrays, with the times as universal times in
+        days or UTC datetime64 values, avoiding the creation of an object for each event."""
+        return self.events_for_observers(min_date, max_date, [observer], output)[0]
+
+    def events_for_observers(self, min_date, max_date, observers, output='datetime'):
+        """Calculates the rise, transit, and set times within the specified UTC dates for each of
+        a sequence of observers, returning a list containing the events for each observer in
+        the same format as events. The positions of the body are only calculated once and the
+        events for all observers and days are refined together, so this is much faster than
+        calling events for each observer."""
+        _check_event_output(output)
 
         # Always calculate an extra day each side to allow interpolation - a date range of a single
         # date uses 3 points: the midnights at the start of the date plus 2 additional ones.
         first_midnight = min_date.toordinal() - 1 + JD_OFFSET
-        ut_midnights = [first_midnight + i for i in range((max_date - min_date).days + 3)]
+        all_events = self._event_uts(first_midnight, (max_date - min_date).days + 3, observers)
+        return [_format_events(uts, event_types, output) for uts, event_types in all_events]
+
+    def iter_events(self, min_date, max_date, observer, chunk_days=DEFAULT_CHUNK_DAYS):
+        """Generates the same events as events, in order, working through the date range
+        chunk_days at a time so that memory use does not grow with the length of the range and
+        the first events are available immediately."""
+        chunk_start = min_date.toordinal() + JD_OFFSET
+        end = max_date.toordinal() + 1 + JD_OFFSET
+        previous = None
+        while chunk_start < end:
+            chunk_end = min(chunk_start + chunk_days, end)
+            uts, event_types = self._chunk_event_uts(chunk_start, chunk_end, [observer])[0]
+            for event in zip(uts.tolist(), event_types.tolist()):
+                # De-dupe in the rare case of the same event being found either side of the
+                # boundary between chunks.
+                if (previous and previous[1] == event[1]
+                        and abs(previous[0] - event[0]) < 0.01):
+                    continue
+                previous = event
+                yield (ut_to_datetime(event[0]), event[1])
+            chunk_start = chunk_end
+
+    def altitude_crossings(self, min_date, max_date, observer, altitudes):
+        """Calculates every time within the specified UTC dates at which the body crosses each of
+        a dictionary of named altitudes in radians (such as SUN_ALTITUDES) as seen by observer,
+        returning a list of (datetime, name, direction) tuples sorted by time, where direction is
+        'rising' or 'setting'. Altitudes are geometric, so include any allowance for refraction
+        or parallax in the thresholds. Pairs of crossings closer together than
+        1/ALTITUDE_SAMPLES_PER_DAY, when the body only just reaches an altitude, may be missed."""
+
+        # Interpolate the equatorial position between midnights, with an extra day each side.
+        first_midnight = min_date.toordinal() - 1 + JD_OFFSET
+        days = (max_date - min_date).days + 1
+        midnights = first_midnight + np.arange(days + 2)
+        ra, decl, _ = self._midnight_positions(first_midnight, days + 2)
+        ra_interp = AngularInterpolator(midnights, ra)
+        decl_interp = Interpolator(midnights, decl)
+
+        def altitude(ut):
+            return _altitude(ut, ra_interp.at(ut), decl_interp.at(ut), observer)
+
+        # Sample the altitude once over the whole range and find the samples either side of each
+        # crossing of each threshold.
+        names = list(altitudes)
+        thresholds = np.array([altitudes[name] for name in names], dtype=float)
+        samples = (midnights[1]
+                   + np.arange(days * ALTITUDE_SAMPLES_PER_DAY + 1) / ALTITUDE_SAMPLES_PER_DAY)
+        above = altitude(samples)[:, np.newaxis] > thresholds
+        sample_index, threshold_index = np.nonzero(above[1:] != above[:-1])
+        rising = ~above[sample_index, threshold_index]
+        target = thresholds[threshold_index]
+        low = samples[sample_index]
+        high = samples[sample_index + 1]
+
+        # Refine all the crossings together by bisection.
+        for _ in range(ALTITUDE_BISECTION_STEPS):
+            mid = (low + high) / 2.0
+            crossed = (altitude(mid) > target) == rising
+            high = np.where(crossed, mid, high)
+            low = np.where(crossed, low, mid)
+        times = (low + high) / 2.0
+
+        return [(ut_to_datetime(float(times[i])), names[threshold_index[i]],
+                 'rising' if rising[i] else 'setting')
+                for i in np.argsort(times, kind='stable')]
+
+    def _chunk_event_uts(self, chunk_start, chunk_end, observers):
+        """Calculates the events between the UT midnights chunk_start and chunk_end for each of a
+        sequence of observers, in the format of _events_from_position_arrays."""
+        # Each chunk is calculated with a few extra days each side so the interpolation near its
+        # edges matches an unchunked calculation, then only events in the chunk are used.
+        first_midnight = chunk_start - 1 - CHUNK_MARGIN_DAYS
+        count = int(chunk_end - chunk_start) + 2 + 2 * CHUNK_MARGIN_DAYS
+        output = []
+        for uts, event_types in self._event_uts(first_midnight, count, observers):
+            in_chunk = (uts >= chunk_start) & (uts < chunk_end)
+            output.append((uts[in_chunk], event_types[in_chunk]))
+        return output
 
-        # Call a method each body should implement to calculate the position.
-        eq_positions = [self.geocentric_position(ut_to_dt(ut))[1] for ut in ut_midnights]
+    def _event_uts(self, first_midnight, count, observers):
+        """Calculates the events for each of a sequence of observers using the positions of the
+        body on count sequential midnights in UT starting at first_midnight, in the format of
+        _events_from_position_arrays."""
+        ra, decl, epoch = self._midnight_positions(first_midnight, count)
         # Farm out most of the work to a function working in ut we can test with a book example.
-        events = self._events_from_positions(eq_positions, first_midnight, observer)
-        # Convert into datetimes.
-        return [(ut_to_datetime(event[0]), event[1]) for event in events]
-
+        return self._events_from_position_arrays(ra, decl, first_midnight, observers, epoch)
+
+    def _midnight_positions(self, first_midnight, count):
+        """Returns the equatorial positions of the body on count sequential midnights in UT
+        starting at first_midnight, as a tuple of (ra, decl, epoch) where epoch is the Epoch for
+        the midnights, so their nutation can be shared with the sidereal time calculation. The
+        position and nutation on each midnight are stored in the ephemeris cache keyed on the
+        body and the day, so repeated and overlapping windows only calculate the new days."""
+        ut_midnights = first_midnight + np.arange(count)
+        cache = _ephemeris_cache
+        if cache is None:
+            # Call a method each body should implement to calculate the positions.
+            epoch = Epoch(ut_to_dt(ut_midnights))
+            _, equatorial = self.geocentric_positions(epoch)
+            return (equatorial.ra, equatorial.decl, epoch)
+
+        first_day = int(round(first_midnight - JD_OFFSET))
+        keys = [('midnight',) + self._cache_key() + (day,)
+                for day in range(first_day, first_day + count)]
+        values = [cache.lookup(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            epoch = Epoch(ut_to_dt(ut_midnights[missing]))
+            _, equatorial = self.geocentric_positions(epoch)
+            calculated = zip(equatorial.ra.tolist(), equatorial.decl.tolist(),
+                             epoch.delta_psi.tolist(), epoch.mean_obliquity.tolist(),
+                             epoch.true_obliquity.tolist())
+            for i, value in zip(missing, calculated):
+                values[i] = value
+                cache.store(keys[i], value)
+        ra, decl, delta_psi, mean_obliquity, true_obliquity = np.array(values).T
+        return (ra, decl, Epoch.from_nutation(ut_to_dt(ut_midnights), delta_psi, mean_obliquity,
+                                              true_obliquity))
 
     def _events_from_positions(self, equatorial_positions, start_midnight, observer):
         """Given a list of equatorial positions for the body on sequential midnights in UT, starting
         at start_midnight, calculates the rise, transit, and set times for all days except the first
         and last, using the latitude and longitude supplied in observer, returning as a list of
         (ut, event_type) tuples where event_type is 'rise', 'transit', or 'set'."""
-
-        # Based on the algorithm in Astronomical Algoriths, pp101
-        output = []
+        uts, event_types = self._events_from_position_arrays(
+            np.array([eq.ra for eq in equatorial_positions]),
+            np.array([eq.decl for eq in equatorial_positions]),
+            start_midnight, [observer])[0]
+        return list(zip(uts.tolist(), event_types.tolist()))
+
+    def _events_from_position_arrays(self, ra, decl, start_midnight, observers, epoch=None):
+        """Given numpy arrays of the right ascension and declination of the body on sequential
+        midnights in UT, starting at start_midnight, calculates the rise, transit, and set times
+        for all days except the first and last for each of a sequence of observers, returning a
+        list containing a tuple of (uts, event types) numpy arrays in time order for each observer.
+        epoch may supply the Epoch for the midnights to reuse its nutation."""
+
+        # Based on the algorithm in Astronomical Algoriths, pp101, evaluated over a grid with a
+        # row for each observer and a column for each non-start/end day.
 
         # Set up spline interpolation on the equatorial elements.
-        midnights = [start_midnight + i for i in range(len(equatorial_positions))]
-        decl_interp = Interpolator(midnights, [eq.decl for eq in equatorial_positions])
-        ra_interp = AngularInterpolator(midnights, [eq.ra for eq in equatorial_positions])
-
-        # Iterate through the non-start/end days where we have enough data to interpolate.
-        for i in range(1, len(equatorial_positions) - 1):
-            eq = equatorial_positions[i]
-            midnight = midnights[i]
-
-            # Check the object actually passes the horizon
-            cos_H0 = ((sin(self.apparent_altitude) - (sin(observer.lat) * sin(eq.decl)))
-                      / (cos(observer.lat) * cos(eq.decl)))
-            if cos_H0 < -1.0 or cos_H0 > 1.0:
-                # Object must never rise or set, don't add events for this day (not even transit).
-                continue
-
-            # First get approximate times
-            theta0 = greenwich_sidereal_time(midnight)
-            H0 = acos(cos_H0)
-            transit = (eq.ra + observer.lng - theta0) / TWO_PI % 1.0
-            rise = (transit - H0 / TWO_PI) % 1.0
-            set_ = (transit + H0 / TWO_PI) % 1.0
-
-            # Then correct a few times to improve
+        midnights = start_midnight + np.arange(len(ra))
+        decl_interp = Interpolator(midnights, decl)
+        ra_interp = AngularInterpolator(midnights, ra)
+
+        # Restrict to the days where we have enough data to interpolate.
+        day_midnights = midnights[1:-1]
+        day_ra = ra[1:-1]
+        day_decl = decl[1:-1]
+        lat = np.array([observer.lat for observer in observers])[:, np.newaxis]
+        lng = np.array([observer.lng for observer in observers])[:, np.newaxis]
+
+        # Check the object actually passes the horizon. If not we don't add any events for that
+        # day (not even transit) and ignore the invalid values calculated below.
+        cos_H0 = ((sin(self.apparent_altitude) - (np.sin(lat) * np.sin(day_decl)))
+                  / (np.cos(lat) * np.cos(day_decl)))
+        passes = (cos_H0 >= -1.0) & (cos_H0 <= 1.0)
+
+        # First get approximate times
+        theta0 = greenwich_sidereal_time(day_midnights, None if epoch is None else epoch[1:-1])
+        H0 = np.arccos(np.clip(cos_H0, -1.0, 1.0))
+        transit = (day_ra + lng - theta0) / TWO_PI % 1.0
+        rise = (transit - H0 / TWO_PI) % 1.0
+        set_ = (transit + H0 / TWO_PI) % 1.0
+
+        # Then correct a few times to improve
+        with np.errstate(divide='ignore', invalid='ignore'):
             for _ in range(3):
                 # Transit
-                alpha = ra_interp.at(midnight + transit)
-                H = theta0 + 6.30038809259 * transit - observer.lng - alpha
-                if H > pi:
-                    H -= TWO_PI
-                elif H < -pi:
-                    H += TWO_PI
+                alpha = ra_interp.at(day_midnights + transit)
+                H = theta0 + 6.30038809259 * transit - lng - alpha
+                H = np.where(H > pi, H - TWO_PI, np.where(H < -pi, H + TWO_PI, H))
                 transit = (transit - H/TWO_PI) % 1.0
 
                 # Rising
-                alpha = ra_interp.at(midnight + rise)
-                delta = decl_interp.at(midnight + rise)
+                alpha = ra_interp.at(day_midnights + rise)
+                delta = decl_interp.at(day_midnights + rise)
 
-                H = theta0 + 6.30038809259 * rise - observer.lng - alpha
-                h = asin(sin(delta) * sin(observer.lat) + cos(observer.lat) * cos(delta) * cos(H))
+                H = theta0 + 6.30038809259 * rise - lng - alpha
+                h = np.arcsin(np.sin(delta) * np.sin(lat)
+                              + np.cos(lat) * np.cos(delta) * np.cos(H))
                 rise = (rise + (h - self.apparent_altitude)
-                        / (TWO_PI * cos(delta) * cos(observer.lat) * sin(H))) % 1.0
+                        / (TWO_PI * np.cos(delta) * np.cos(lat) * np.sin(H))) % 1.0
 
                 # Setting
-                alpha = ra_interp.at(midnight + set_)
-                delta = decl_interp.at(midnight + set_)
+                alpha = ra_interp.at(day_midnights + set_)
+                delta = decl_interp.at(day_midnights + set_)
 
-                H = theta0 + 6.30038809259 * set_ - observer.lng - alpha
-                h = asin(sin(delta) * sin(observer.lat) + cos(observer.lat) * cos(delta) * cos(H))
+                H = theta0 + 6.30038809259 * set_ - lng - alpha
+                h = np.arcsin(np.sin(delta) * np.sin(lat)
+                              + np.cos(lat) * np.cos(delta) * np.cos(H))
                 set_ = (set_ + (h - self.apparent_altitude)
-                        / (TWO_PI * cos(delta) * cos(observer.lat) * sin(H))) % 1.0
-
-            # Add the outputs in sorted order, de-duping in the rare case of the same
-            # event being found twice on multiple days.
-            events = [(midnight + rise, 'rise'),
-                      (midnight + transit, 'transit'),
-                      (midnight + set_, 'set')]
-            events.sort(key = lambda tup: tup[0])
-            if (output and output[-1][1] == events[0][1]
-                    and abs(output[-1][0] - events[0][0]) < 0.01):
-                events.pop(0)
-            output.extend(events)
-        return output
+                        / (TWO_PI * np.cos(delta) * np.cos(lat) * np.sin(H))) % 1.0
+
+        # Sort the events on each day.
+        times = np.stack((rise, transit, set_), axis=-1) + day_midnights[:, np.newaxis]
+        orders = np.argsort(times, axis=-1, kind='stable')
+        times = np.take_along_axis(times, orders, axis=-1)
+        event_types = np.array(EVENT_TYPES)
+
+        # Join the days where the body passes the horizon, de-duping in the rare case of the
+        # first event on a day being the same as the last event on the previous day.
+        all_output = []
+        for obs_times, obs_orders, obs_passes in zip(times, orders, passes):
+            obs_times = obs_times[obs_passes].ravel()
+            obs_orders = obs_orders[obs_passes].ravel()
+            duplicate = np.zeros(len(obs_times), dtype=bool)
+            duplicate[3::3] = ((obs_orders[3::3] == obs_orders[2:-1:3])
+                               & (np.abs(obs_times[3::3] - obs_times[2:-1:3]) < 0.01))
+            all_output.append((obs_times[~duplicate], event_types[obs_orders[~duplicate]]))
+        return all_output
 
 
 class Sun(Body):
     """Calucations for the position of the sun."""
-    def __init__(self):
-        super(Sun, self).__init__(-0.833 * DEG_TO_RAD)
+    def __init__(self, precision='full'):
+        super(Sun, self).__init__(-0.833 * DEG_TO_RAD, precision)
 
+    @_memoize
+    @_tabulated
     def geocentric_position(self, dt):
         """Returns the apparent position of the sun at the supplied dynamical time, returning
         a tuple of (spherical coordinates, ecliptic coordinates)."""
@@ -707,22 +1597,44 @@ class Sun(Body):
         # First calculate the position on the earth in geocentric coordinates
         # pp218 Astronomical Algorithms
 
-        # Time in millenia and centuries
+        # Time in millenia
         Tau = (dt - 2451545.0) / 365250.0
-        T = Tau * 10.0
 
         # Accumulate the L, B and R terms using a separate for each term at each order.
+        L_series, B_series, R_series = _sun_series(self.precision)
         L = B = R = 0.0
-        for order, matrix in zip(range(6), (L0, L1, L2, L3, L4, L5)):
+        for order, matrix in enumerate(L_series):
             L_component = sum((row[0] * cos(row[1] + row[2]*Tau)) for row in matrix)
             L += L_component * pow(Tau, order) / 1e8
-        for order, matrix in zip(range(6), (B0, B1, B2, B3, B4)):
+        for order, matrix in enumerate(B_series):
             B_component = sum((row[0] * cos(row[1] + row[2]*Tau)) for row in matrix)
             B += B_component * pow(Tau, order) / 1e8
-        for order, matrix in zip(range(6), (R0, R1, R2, R3, R4)):
+        for order, matrix in enumerate(R_series):
             R_component = sum((row[0] * cos(row[1] + row[2]*Tau)) for row in matrix)
             R += R_component * pow(Tau, order) / 1e8
 
+        return self._apparent_position(Epoch(dt), L, B, R)
+
+    @_tabulated
+    def geocentric_positions(self, dts):
+        """Returns the apparent positions of the sun at each dynamical time in the supplied numpy
+        array (or Epoch), returning a tuple of (SphericalCoordinates, EquatorialCoordinates)."""
+        epoch = Epoch.of(dts)
+        Tau = (epoch.dt - 2451545.0) / 365250.0
+        L_packed, B_packed, R_packed = _packed_sun_series(self.precision)
+        L = _sum_series_array(L_packed, Tau)
+        B = _sum_series_array(B_packed, Tau)
+        R = _sum_series_array(R_packed, Tau)
+        return self._apparent_position(epoch, L, B, R)
+
+    @staticmethod
+    def _apparent_position(epoch, L, B, R):
+        """Converts the earth's heliocentric L, B, and R at the supplied Epoch into the apparent
+        position of the sun, in the format of geocentric_position. Works equally on scalars and
+        numpy arrays."""
+        m = _math_for(epoch.T)
+        T = epoch.T
+
         # pp166 for conversion from earth position to sun position
         longitude = (L + pi) % (2 * pi)
         latitude = -B
@@ -731,29 +1643,64 @@ class Sun(Body):
         # the correction should not be large enough to be noticed
         lambda_dash = longitude - 1.397 * DEG_TO_RAD * T - 0.00031 * DEG_TO_RAD * T * T
         longitude -= 0.09033/3600.0 * DEG_TO_RAD
-        latitude += 0.03916/3600.0 * DEG_TO_RAD * (cos(lambda_dash)-sin(lambda_dash))
+        latitude += 0.03916/3600.0 * DEG_TO_RAD * (m.cos(lambda_dash)-m.sin(lambda_dash))
 
         # Now correct for nutation and abberation and convert to equatorial.
-        delta_psi, _, epsilon = nutation(dt)
         abberation = -20.4898 / 3600.0 * DEG_TO_RAD / R
-        longitude += (delta_psi + abberation)
+        longitude += (epoch.delta_psi + abberation)
 
-        ecliptic = SphericalCoordinate(latitude, longitude, range_km=R * ONE_AU_IN_KM)
-        return (ecliptic, ecliptic.to_equatorial(epsilon))
+        coordinate = SphericalCoordinate if m is math else SphericalCoordinates
+        ecliptic = coordinate(latitude, longitude, range_km=R * ONE_AU_IN_KM)
+        return (ecliptic, ecliptic.to_equatorial(epoch.true_obliquity))
 
 
 class Moon(Body):
     """Calucations for the position and phase of the moon."""
-    def __init__(self):
-        super(Moon, self).__init__(+0.125 * DEG_TO_RAD)
+    def __init__(self, precision='full'):
+        super(Moon, self).__init__(+0.125 * DEG_TO_RAD, precision)
 
+    @_memoize
+    @_tabulated
     def geocentric_position(self, dt):
         """Returns the apparent position of the moon at the supplied dynamical time, returning
         a tuple of (spherical coordinates, ecliptic coordinates)."""
         # pp338 Astronomical Algorithms
 
-        # Time in centuries
-        T = (dt - 2451545.0)/36525.0
+        epoch = Epoch(dt)
+        Ldash, D, M, Mdash, F, E = self._fundamental_arguments(epoch.T)
+        E_powers = (1.0, E, E * E)
+        terms_L, terms_R, terms_B = _moon_series(self.precision)
+
+        # Add up coefficients for corrections to longitude
+        sigmaL = 0.0
+        for d, m, mdash, f, coef in terms_L:
+            sigmaL += E_powers[abs(m)] * coef * sin(d * D + m * M + mdash * Mdash + f * F)
+
+        # Add up coefficients for corrections to distance
+        sigmaR = 0.0
+        for d, m, mdash, f, coef in terms_R:
+            sigmaR += E_powers[abs(m)] * coef * cos(d * D + m * M + mdash * Mdash + f * F)
+
+        # Add up coefficients for corrections to latitude
+        sigmaB = 0.0
+        for d, m, mdash, f, coef in terms_B:
+            sigmaB += E_powers[abs(m)] * coef * sin(d * D + m * M + mdash * Mdash + f * F)
+
+        return self._apparent_position(epoch, Ldash, Mdash, F, sigmaL, sigmaR, sigmaB)
+
+    @_tabulated
+    def geocentric_positions(self, dts):
+        """Returns the apparent positions of the moon at each dynamical time in the supplied numpy
+        array (or Epoch), returning a tuple of (SphericalCoordinates, EquatorialCoordinates)."""
+        epoch = Epoch.of(dts)
+        Ldash, D, M, Mdash, F, E = self._fundamental_arguments(epoch.T)
+        sigmaL, sigmaR, sigmaB = _sum_lunar_series_array(D, M, Mdash, F, E, self.precision)
+        return self._apparent_position(epoch, Ldash, Mdash, F, sigmaL, sigmaR, sigmaB)
+
+    @staticmethod
+    def _fundamental_arguments(T):
+        """Returns a tuple of (Ldash, D, M, Mdash, F, E) for a time in centuries. Works equally on
+        scalars and numpy arrays."""
         # Moon's mean longitude.
         Ldash = ((218.3164477 + 481267.88123421 * T - 0.0015786 * T**2 + T**3 / 538841.0
                   - T**4 / 65194000.0) * DEG_TO_RAD) % TWO_PI
@@ -771,29 +1718,24 @@ class Moon(Body):
               - T**3 / 3526000.0 + T**4 / 863310000.0) * DEG_TO_RAD) % TWO_PI
         # Eccentricity of earth's orbit
         E = 1.0 - 0.002516 * T - 0.0000074 * T**2
+        return (Ldash, D, M, Mdash, F, E)
 
-        # Add up coefficients for corrections to longitude and distance
-        sigmaL = sigmaR = 0.0
-        for arg_LR, coef_LR in zip(arguments_LR, coefficients_LR):
-            arg = arg_LR[0] * D + arg_LR[1] * M + arg_LR[2] * Mdash + arg_LR[3] * F
-            coef_fac = pow(E, abs(arg_LR[1]))
-            sigmaL += coef_fac * coef_LR[0] * sin(arg)
-            sigmaR += coef_fac * coef_LR[1] * cos(arg)
-
-        # Add up coefficients for corrections to latitude
-        sigmaB = 0.0
-        for arg_B, coef_B in zip(arguments_B, coefficients_B):
-            arg = arg_B[0] * D + arg_B[1] * M + arg_B[2] * Mdash + arg_B[3] * F
-            coef_fac = pow(E, abs(arg_B[1]))
-            sigmaB += coef_fac * coef_B * sin(arg)
+    @staticmethod
+    def _apparent_position(epoch, Ldash, Mdash, F, sigmaL, sigmaR, sigmaB):
+        """Adds the planetary corrections to the summed lunar series at the supplied Epoch and
+        converts to the apparent position of the moon, in the format of geocentric_position.
+        Works equally on scalars and numpy arrays."""
+        m = _math_for(epoch.T)
+        T = epoch.T
 
         # Now add the corrections due to the planets
         a1 = ((119.75 + 131.849 * T) * DEG_TO_RAD) % TWO_PI
         a2 = ((53.09 + 479264.290 * T) * DEG_TO_RAD) % TWO_PI
         a3 = ((313.45 + 481266.484 * T) * DEG_TO_RAD) % TWO_PI
-        sigmaL += 3958.0 * sin(a1) + 1962.0 * sin(Ldash - F) + 318.0 * sin(a2)
-        sigmaB += (-2235.0 * sin(Ldash) + 382.0 * sin(a3) + 175.0 * sin(a1 - F)
-                   + 175.0 * sin(a1 + F) + 127.0 * sin(Ldash - Mdash) - 115.0 * sin(Ldash + Mdash))
+        sigmaL = sigmaL + 3958.0 * m.sin(a1) + 1962.0 * m.sin(Ldash - F) + 318.0 * m.sin(a2)
+        sigmaB = sigmaB + (-2235.0 * m.sin(Ldash) + 382.0 * m.sin(a3) + 175.0 * m.sin(a1 - F)
+                           + 175.0 * m.sin(a1 + F) + 127.0 * m.sin(Ldash - Mdash)
+                           - 115.0 * m.sin(Ldash + Mdash))
 
         # Get the coordinates in ecliptic.
         latitude = sigmaB / 1000000.0 * DEG_TO_RAD
@@ -801,11 +1743,11 @@ class Moon(Body):
         range_km = 385000.56 + sigmaR / 1000.0
 
         # Now correct for nutation and convert to equatorial.
-        delta_psi, _, epsilon = nutation(dt)
-        longitude += delta_psi
+        longitude += epoch.delta_psi
 
-        ecliptic = SphericalCoordinate(latitude, longitude, range_km=range_km)
-        return (ecliptic, ecliptic.to_equatorial(epsilon))
+        coordinate = SphericalCoordinate if m is math else SphericalCoordinates
+        ecliptic = coordinate(latitude, longitude, range_km=range_km)
+        return (ecliptic, ecliptic.to_equatorial(epoch.true_obliquity))
 
 
     def phase(self, datetime_object):
@@ -819,10 +1761,7 @@ class Moon(Body):
         moon, _ = self.geocentric_position(dt)
         sun, _ = Sun().geocentric_position(dt)
 
-        # Calculate the phase angle (aka i) and lit fraction (aka k).
-        psi = acos(cos(moon.lat) * cos(moon.lng - sun.lng))
-        phase = atan2(sun.rng * sin(psi), moon.rng - sun.rng * cos(psi))
-        fraction_illuminated = (1.0 + cos(phase)) / 2.0
+        phase, fraction_illuminated = self._phase_angle(moon, sun)
 
         # And name the phase, allowing 20 degrees (a bit under two days) for full/new/quarter.
         phase_deg = phase * RAD_TO_DEG
@@ -845,3 +1784,444 @@ class Moon(Body):
         else: desc = 'full'
 
         return (phase, desc, fraction_illuminated)
+
+    def phases(self, uts):
+        """Returns moon phase information for each universal time in a numpy array, as a tuple of
+        (phase angles in radians, fractions illuminated) arrays."""
+        epoch = Epoch(ut_to_dt(np.asarray(uts, dtype=float)))
+        moon, _ = self.geocentric_positions(epoch)
+        sun, _ = Sun().geocentric_positions(epoch)
+        return self._phase_angle(moon, sun)
+
+    def phase_events(self, min_date, max_date):
+        """Calculates the times of the principal phases (new moon, first quarter, full moon, and
+        last quarter) within the specified UTC dates, returning a list of (datetime, phase) tuples
+        where phase is one of PRINCIPAL_PHASES."""
+        # The principal phases are defined by the difference in apparent longitude between the
+        # moon and sun (pp349) reaching a multiple of 90 degrees. Sample this elongation daily to
+        # find the day containing each phase then refine all the phases together with Newton's
+        # method, using the rate of change over the bracketing day as the derivative.
+        start = min_date.toordinal() + JD_OFFSET
+        end = max_date.toordinal() + 1 + JD_OFFSET
+        samples = start + np.arange(int(end - start) + 1)
+        elongations = np.unwrap(self._elongations(samples))
+        quarters = np.floor(elongations / (pi / 2.0))
+        index = np.nonzero(np.diff(quarters))[0]
+        targets = quarters[index + 1] * pi / 2.0
+        rates = elongations[index + 1] - elongations[index]
+        uts = samples[index] + (targets - elongations[index]) / rates
+        for _ in range(MOON_PHASE_ITERATIONS):
+            error = (self._elongations(uts) - targets + pi) % TWO_PI - pi
+            uts -= error / rates
+        return [(ut_to_datetime(float(ut)), PRINCIPAL_PHASES[int(quarter) % 4])
+                for ut, quarter in zip(uts, quarters[index + 1]) if start <= ut < end]
+
+    def eclipses(self, min_date, max_date):
+        """Finds the solar and lunar eclipses within the specified UTC dates, returning a list of
+        (datetime, eclipse_type, magnitude) tuples sorted by the time of greatest eclipse, where
+        eclipse_type is one of ECLIPSE_TYPES. The magnitude of a partial solar eclipse is the
+        greatest fraction of the sun's diameter covered anywhere on earth, and of a central solar
+        eclipse the ratio of the apparent diameters of the moon and sun on the shadow axis. The
+        magnitude of a lunar eclipse is the fraction of the moon's diameter inside the umbra, or
+        for a penumbral eclipse inside the penumbra. The earth is treated as a sphere so eclipses
+        that only graze the earth may be classified wrongly."""
+        start = min_date.toordinal() + JD_OFFSET
+        end = max_date.toordinal() + 1 + JD_OFFSET
+
+        # Only new and full moons near a node of the moon's orbit can be eclipses, so screen the
+        # mean phases using the moon's argument of latitude before calculating any positions
+        # (pp350 and pp380). Whole k are new moons and half k full moons.
+        first_k = floor((ut_to_dt(start) - 2451550.09766) / 29.530588861) - 1
+        k = ((first_k + np.arange(int((end - start) / 29.530588861) + 3))[:, np.newaxis]
+             + np.array([0.0, 0.5])).ravel()
+        T = k / 1236.85
+        F = (160.7108 + 390.67050284 * k - 0.0016118 * T**2 - 0.00000227 * T**3
+             + 0.000000011 * T**4) * DEG_TO_RAD
+        near_node = np.abs(np.sin(F)) < ECLIPSE_LATITUDE_LIMIT
+        k = k[near_node]
+        T = T[near_node]
+        solar = k % 1.0 == 0.0
+        uts = dt_to_ut(2451550.09766 + 29.530588861 * k + 0.00015437 * T**2
+                       - 0.000000150 * T**3 + 0.00000000073 * T**4)
+
+        # Refine to the true new and full moons using the mean rate of change of elongation.
+        targets = np.where(solar, 0.0, pi)
+        for _ in range(MOON_PHASE_ITERATIONS):
+            error = (self._elongations(uts) - targets + pi) % TWO_PI - pi
+            uts -= error / (TWO_PI / 29.530588861)
+
+        # Then find greatest eclipse, where the distance between the shadow axis and the body
+        # it falls on is smallest, fitting a parabola to the square of the distance.
+        for _ in range(ECLIPSE_ITERATIONS):
+            before, now, after = (self._eclipse_geometry(uts + offset, solar)[0]**2
+                                  for offset in (-ECLIPSE_STEP_DAYS, 0.0, ECLIPSE_STEP_DAYS))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                step = ECLIPSE_STEP_DAYS * (after - before) / (2.0 * (after - 2.0 * now + before))
+            uts -= np.nan_to_num(np.clip(step, -0.5, 0.5))
+        gamma, umbra, penumbra, along, length = self._eclipse_geometry(uts, solar)
+
+        # Solar eclipses, where the moon's shadow falls on the earth (pp381).
+        central = gamma < EARTH_RADIUS_KM
+        observer_distance = along - np.sqrt(np.maximum(EARTH_RADIUS_KM**2 - gamma**2, 0.0))
+        solar_magnitude = np.where(
+            central,
+            (MOON_RADIUS_KM / observer_distance)
+            / (SUN_RADIUS_KM / (length + observer_distance)),
+            (EARTH_RADIUS_KM + penumbra - gamma) / (penumbra - umbra))
+        solar_type = np.where(central, np.where(umbra > 0.0, 0, 1), 2)
+        # Lunar eclipses, where the moon passes through the earth's shadow (pp382).
+        umbral_magnitude = (umbra + MOON_RADIUS_KM - gamma) / (2.0 * MOON_RADIUS_KM)
+        penumbral_magnitude = (penumbra + MOON_RADIUS_KM - gamma) / (2.0 * MOON_RADIUS_KM)
+        lunar_magnitude = np.where(umbral_magnitude > 0.0, umbral_magnitude, penumbral_magnitude)
+        lunar_type = np.where(umbral_magnitude >= 1.0, 3, np.where(umbral_magnitude > 0.0, 4, 5))
+
+        magnitudes = np.where(solar, solar_magnitude, lunar_magnitude)
+        types = np.where(solar, solar_type, lunar_type)
+        eclipse = (np.where(solar, gamma < EARTH_RADIUS_KM + penumbra, penumbral_magnitude > 0.0)
+                   & (uts >= start) & (uts < end))
+        return [(ut_to_datetime(float(uts[i])), ECLIPSE_TYPES[types[i]], float(magnitudes[i]))
+                for i in np.nonzero(eclipse)[0][np.argsort(uts[eclipse], kind='stable')]]
+
+    def _eclipse_geometry(self, uts, solar):
+        """Returns the geometry of the shadow cast by the moon (where solar is True) or earth
+        (where solar is False) at each universal time in a numpy array, as a tuple of arrays
+        of the distance in km between the shadow axis and the center of the body the shadow
+        falls on, the radii in km of the umbra (negative beyond its tip) and penumbra at that
+        body, the distance in km from the body casting the shadow to that body along the axis,
+        and the distance in km from the sun to the body casting the shadow."""
+        epoch = Epoch(ut_to_dt(uts))
+        moon, _ = self.geocentric_positions(epoch)
+        sun, _ = Sun().geocentric_positions(epoch)
+        moon_position = _cartesian(moon)
+        sun_position = _cartesian(sun)
+
+        # Work relative to the body casting the shadow, with the axis pointing away from the sun.
+        solar = solar[:, np.newaxis]
+        caster = np.where(solar, moon_position, 0.0)
+        target = np.where(solar, 0.0, moon_position) - caster
+        axis = caster - sun_position
+        length = np.linalg.norm(axis, axis=-1)
+        axis /= length[:, np.newaxis]
+        along = np.sum(target * axis, axis=-1)
+        gamma = np.linalg.norm(target - along[:, np.newaxis] * axis, axis=-1)
+
+        radius = np.where(solar[:, 0], MOON_RADIUS_KM, EARTH_RADIUS_KM * EARTH_SHADOW_ENLARGEMENT)
+        umbra = radius - along * (SUN_RADIUS_KM - radius) / length
+        penumbra = radius + along * (SUN_RADIUS_KM + radius) / length
+        return (gamma, umbra, penumbra, along, length)
+
+    def _elongations(self, uts):
+        """Returns the difference between the apparent longitudes of the moon and sun in the range
+        [0, 2*PI> at each universal time in a numpy array."""
+        epoch = Epoch(ut_to_dt(uts))
+        moon, _ = self.geocentric_positions(epoch)
+        sun, _ = Sun().geocentric_positions(epoch)
+        return (moon.lng - sun.lng) % TWO_PI
+
+    @staticmethod
+    def _phase_angle(moon, sun):
+        """Returns a tuple of the (phase angle (aka i), fraction illuminated (aka k)) given the
+        ecliptic positions of the moon and sun. Works equally on scalars and numpy arrays."""
+        m = _math_for(moon.lat)
+        psi = m.acos(m.cos(moon.lat) * m.cos(moon.lng - sun.lng))
+        phase = m.atan2(sun.rng * m.sin(psi), moon.rng - sun.rng * m.cos(psi))
+        return (phase, (1.0 + m.cos(phase)) / 2.0)
+
+
+class Almanac:
+    """The rise, transit, and set times of a body for a single observer over a window of dates
+    that moves forward over time, such as the next 30 days. The positions of the body and the
+    events already calculated are kept between calls, so when the window slides forward only the
+    newly needed days are calculated and the days that have passed are dropped."""
+    def __init__(self, body, observer):
+        self.body = body
+        self.observer = observer
+        self._reset(None)
+
+    def events(self, min_date, max_date, output='datetime'):
+        """Returns the events within the specified UTC dates in the same format as Body.events,
+        calculating only the days after the end of the previous window. A window starting before
+        the previous one, or after its end, is calculated from scratch."""
+        _check_event_output(output)
+        start = min_date.toordinal() + JD_OFFSET
+        end = max_date.toordinal() + 1 + JD_OFFSET
+        if self._start is None or not self._start <= start <= self._end:
+            self._reset(start)
+
+        # Drop the events and positions that are no longer needed, keeping enough positions
+        # before the window to interpolate as Body.iter_events does for each chunk.
+        keep = self._uts >= start
+        self._uts = self._uts[keep]
+        self._event_types = self._event_types[keep]
+        passed = int(start - 1 - CHUNK_MARGIN_DAYS - self._first_midnight)
+        self._first_midnight += passed
+        self._ra = self._ra[passed:]
+        self._decl = self._decl[passed:]
+        self._start = start
+
+        if end > self._end:
+            self._extend(end)
+        in_window = self._uts < end
+        return _format_events(self._uts[in_window], self._event_types[in_window], output)
+
+    def _reset(self, start):
+        """Discards all the positions and events, starting an empty window at the UT midnight
+        start."""
+        self._start = start
+        self._end = start
+        self._first_midnight = None if start is None else start - 1 - CHUNK_MARGIN_DAYS
+        self._ra = np.empty(0)
+        self._decl = np.empty(0)
+        self._uts = np.empty(0)
+        self._event_types = np.empty(0, dtype=str)
+
+    def _extend(self, end):
+        """Calculates the events from the end of the window to the UT midnight end, calculating
+        the positions on any midnights not already known."""
+        first_midnight = self._end - 1 - CHUNK_MARGIN_DAYS
+        last_midnight = end + CHUNK_MARGIN_DAYS
+        known_end = self._first_midnight + len(self._ra)
+        if last_midnight >= known_end:
+            midnights = known_end + np.arange(int(last_midnight - known_end) + 1)
+            _, equatorial = self.body.geocentric_positions(Epoch(ut_to_dt(midnights)))
+            self._ra = np.concatenate((self._ra, equatorial.ra))
+            self._decl = np.concatenate((self._decl, equatorial.decl))
+
+        offset = int(first_midnight - self._first_midnight)
+        count = int(last_midnight - first_midnight) + 1
+        (uts, event_types), = self.body._events_from_position_arrays(
+            self._ra[offset:offset + count], self._decl[offset:offset + count], first_midnight,
+            [self.observer])
+        new = (uts >= self._end) & (uts < end)
+        uts = uts[new]
+        event_types = event_types[new]
+        # De-dupe in the rare case of the same event being found either side of the old end.
+        if (len(self._uts) and len(uts) and self._event_types[-1] == event_types[0]
+                and abs(self._uts[-1] - uts[0]) < 0.01):
+            uts, event_types = uts[1:], event_types[1:]
+        self._uts = np.concatenate((self._uts, uts))
+        self._event_types = np.concatenate((self._event_types, event_types))
+        self._end = end
+
+
+def horizontal_track(body, observer, uts, refraction=False):
+    """Returns the altitude and azimuth of body as seen by observer at each universal time in a
+    numpy array, as a tuple of (altitude, azimuth) arrays in radians with azimuth measured
+    eastward from north. The altitude is corrected for the parallax of the body, and for
+    atmospheric refraction if refraction is True."""
+    uts = np.asarray(uts, dtype=float)
+    epoch = Epoch(ut_to_dt(uts.ravel()))
+    ecliptic, equatorial = body.geocentric_positions(epoch)
+    altitude, azimuth = _horizontal(uts.ravel(), equatorial.ra, equatorial.decl, observer, epoch)
+    # Move from the center of the earth to its surface (pp279).
+    altitude = np.arctan2(np.sin(altitude) - EARTH_RADIUS_KM / ecliptic.rng, np.cos(altitude))
+    if refraction:
+        altitude = altitude + _refraction(altitude)
+    return (altitude.reshape(uts.shape), azimuth.reshape(uts.shape))
+
+
+def parallel_events(body, min_date, max_date, observers, max_workers=None,
+                    chunk_days=PARALLEL_CHUNK_DAYS, chunk_observers=PARALLEL_CHUNK_OBSERVERS,
+                    output='datetime'):
+    """Calculates the same events as body.events_for_observers using a pool of max_workers
+    processes (defaulting to the number of CPUs), for large jobs over many observers and years.
+    The work is split into chunks of up to chunk_days days and chunk_observers observers, each of
+    which is calculated in a separate process then merged."""
+    _check_event_output(output)
+    start = min_date.toordinal() + JD_OFFSET
+    end = max_date.toordinal() + 1 + JD_OFFSET
+    chunk_starts = [start + i * chunk_days for i in range(int(ceil((end - start) / chunk_days)))]
+    observer_groups = [observers[i:i + chunk_observers]
+                       for i in range(0, len(observers), chunk_observers)]
+
+    with futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        jobs = [[executor.submit(_chunk_events, body, chunk_start,
+                                 min(chunk_start + chunk_days, end), group)
+                 for chunk_start in chunk_starts]
+                for group in observer_groups]
+
+        all_events = []
+        for group, group_jobs in zip(observer_groups, jobs):
+            group_uts = [[np.empty(0)] for _ in group]
+            group_types = [[np.empty(0, dtype=str)] for _ in group]
+            for job in group_jobs:
+                for observer_uts, observer_types, (uts, event_types) in zip(
+                        group_uts, group_types, job.result()):
+                    # De-dupe in the rare case of the same event being found either side of the
+                    # boundary between chunks.
+                    if (len(observer_uts[-1]) and len(uts)
+                            and observer_types[-1][-1] == event_types[0]
+                            and abs(observer_uts[-1][-1] - uts[0]) < 0.01):
+                        uts, event_types = uts[1:], event_types[1:]
+                    if len(uts):
+                        observer_uts.append(uts)
+                        observer_types.append(event_types)
+            all_events.extend(_format_events(np.concatenate(uts), np.concatenate(event_types),
+                                             output)
+                              for uts, event_types in zip(group_uts, group_types))
+    return all_events
+
+
+def _chunk_events(body, chunk_start, chunk_end, observers):
+    """Calculates the events for one chunk of parallel_events in a worker process, returning the
+    compact arrays of _chunk_event_uts which are quick to send back to the parent."""
+    return body._chunk_event_uts(chunk_start, chunk_end, observers)
+
+
+def _check_event_output(output):
+    """Raises a ValueError if output is not one of EVENT_OUTPUTS."""
+    if output not in EVENT_OUTPUTS:
+        raise ValueError('Unknown event output: {}'.format(output))
+
+
+def _format_events(uts, event_types, output):
+    """Converts numpy arrays of event times in UT and event types to the format of Body.events
+    for an output in EVENT_OUTPUTS."""
+    if output == 'ut':
+        return (uts, event_types)
+    if output == 'datetime64':
+        return (ut_to_datetime64(uts), event_types)
+    # Converting through datetime64 creates the naive datetimes in bulk, leaving only the time
+    # zone to set on each.
+    utc = tz.UTC
+    return [(moment.replace(tzinfo=utc), event_type)
+            for moment, event_type in zip(ut_to_datetime64(uts).tolist(), event_types.tolist())]
+
+
+class EphemerisTable:
+    """Positions of the sun and moon precomputed over a range of dynamical times and stored as
+    Chebyshev series in a compact binary file, which is memory mapped so a table spanning
+    centuries can be opened instantly. Each body's range is split into fixed length segments
+    (see TABLE_SEGMENTS) and the ecliptic latitude, longitude, and range in each segment are
+    fitted at the Chebyshev nodes, giving interpolated positions that match the direct
+    calculation to better than 0.001 arcseconds. Build a table using EphemerisTable.build or
+    the build-table command of this module."""
+
+    MAGIC = b'ASTRONOMY EPHEMERIS 1\n'
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            if file.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError('{} is not an ephemeris table'.format(path))
+            header_length, = struct.unpack('<Q', file.read(8))
+            self.bodies = json.loads(file.read(header_length).decode('utf-8'))
+        data_offset = len(self.MAGIC) + 8 + header_length
+        data = np.memmap(path, dtype='<f8', mode='r', offset=data_offset)
+        self._coefficients = {}
+        for name, info in self.bodies.items():
+            shape = (info['segments'], 3, info['degree'] + 1)
+            count = shape[0] * shape[1] * shape[2]
+            self._coefficients[name] = data[info['offset']:info['offset'] + count].reshape(shape)
+
+    @classmethod
+    def build(cls, path, start_dt, end_dt):
+        """Calculates the positions of the sun and moon between the supplied dynamical times and
+        writes them to a new table at path, returning the table."""
+        header = {}
+        arrays = []
+        offset = 0
+        for body in (Sun(), Moon()):
+            name = type(body).__name__
+            segment_days, degree = TABLE_SEGMENTS[name]
+            segments = int(np.ceil((end_dt - start_dt) / segment_days))
+            # Sample each segment at the Chebyshev nodes and fit by inverting the Vandermonde
+            # matrix, which is well conditioned at these nodes.
+            nodes = np.cos(pi * (np.arange(degree + 1) + 0.5) / (degree + 1))
+            inverse = np.linalg.inv(np.polynomial.chebyshev.chebvander(nodes, degree))
+            segment_starts = start_dt + segment_days * np.arange(segments)
+            dts = segment_starts[:, np.newaxis] + (nodes + 1.0) / 2.0 * segment_days
+            with _direct_calculation():
+                ecliptic, _ = body.geocentric_positions(dts.ravel())
+            values = np.stack((ecliptic.lat.reshape(dts.shape),
+                               np.unwrap(ecliptic.lng.reshape(dts.shape), axis=1),
+                               ecliptic.rng.reshape(dts.shape)), axis=-1)
+            coefficients = np.einsum('kn,snc->sck', inverse, values)
+            header[name] = {'start': start_dt, 'segment_days': segment_days, 'degree': degree,
+                            'segments': segments, 'offset': offset}
+            arrays.append(coefficients.astype('<f8').ravel())
+            offset += coefficients.size
+
+        encoded_header = json.dumps(header).encode('utf-8')
+        # Pad the header so the coefficient data is aligned.
+        encoded_header += b' ' * (-(len(cls.MAGIC) + 8 + len(encoded_header)) % 8)
+        with open(path, 'wb') as file:
+            file.write(cls.MAGIC)
+            file.write(struct.pack('<Q', len(encoded_header)))
+            file.write(encoded_header)
+            for array in arrays:
+                file.write(array.tobytes())
+        return cls(path)
+
+    def covers(self, name, dt):
+        """Returns True if the table contains the named body at dt, which may be a scalar or a
+        numpy array of dynamical times."""
+        info = self.bodies.get(name)
+        if info is None:
+            return False
+        end = info['start'] + info['segments'] * info['segment_days']
+        if isinstance(dt, (float, int)):
+            return info['start'] <= dt < end
+        dt = np.asarray(dt)
+        return bool(dt.size) and info['start'] <= dt.min() and dt.max() < end
+
+    def position(self, name, dt):
+        """Returns the interpolated position of the named body at dt, which may be a scalar or a
+        numpy array of dynamical times or an Epoch, in the same format as geocentric_position."""
+        epoch = Epoch.of(dt)
+        dt = epoch.dt
+        info = self.bodies[name]
+        segment_days = info['segment_days']
+        if isinstance(dt, (float, int)):
+            segment = int((dt - info['start']) // segment_days)
+            x = 2.0 * (dt - info['start'] - segment * segment_days) / segment_days - 1.0
+            lat, lng, rng = (_chebyshev_scalar(coefficients, x)
+                             for coefficients in self._coefficients[name][segment].tolist())
+            coordinate = SphericalCoordinate
+        else:
+            dt = np.asarray(dt, dtype=float)
+            segment = ((dt - info['start']) // segment_days).astype(int)
+            x = 2.0 * (dt - info['start'] - segment * segment_days) / segment_days - 1.0
+            lat, lng, rng = _chebyshev(self._coefficients[name][segment],
+                                       x[:, np.newaxis]).T
+            coordinate = SphericalCoordinates
+        ecliptic = coordinate(lat, lng % TWO_PI, range_km=rng)
+        return (ecliptic, ecliptic.to_equatorial(epoch.true_obliquity))
+
+    def max_errors(self, body, dts):
+        """Compares the tabulated positions of body against a direct calculation at each of a
+        numpy array of dynamical times, returning a tuple of the largest (angular error in
+        arcseconds, range error in km)."""
+        tabulated, _ = self.position(type(body).__name__, dts)
+        with _direct_calculation():
+            direct, _ = body.geocentric_positions(dts)
+        delta_lng = (tabulated.lng - direct.lng + pi) % TWO_PI - pi
+        angle = np.hypot(delta_lng * np.cos(direct.lat), tabulated.lat - direct.lat)
+        return (float(angle.max() * RAD_TO_DEG * 3600.0),
+                float(np.abs(tabulated.rng - direct.rng).max()))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Tools for the astronomy module.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser(
+        'build-table', help='Build an ephemeris table of sun and moon positions.')
+    build_parser.add_argument('path', help='File to write the table to.')
+    build_parser.add_argument('--start-year', type=int, default=1900,
+                              help='First year in the table.')
+    build_parser.add_argument('--end-year', type=int, default=2100,
+                              help='Last year in the table.')
+    args = parser.parse_args()
+
+    if args.command == 'build-table':
+        start = ut_to_dt(date(args.start_year, 1, 1).toordinal() + JD_OFFSET)
+        end = ut_to_dt(date(args.end_year + 1, 1, 1).toordinal() + JD_OFFSET)
+        table = EphemerisTable.build(args.path, start, end)
+        print('Wrote {} ({} bytes)'.format(args.path, os.path.getsize(args.path)))
+        # Check the accuracy at random times that do not coincide with the fitted nodes.
+        check_dts = np.random.default_rng().uniform(start, end, 10000)
+        for check_body in (Sun(), Moon()):
+            angle_error, range_error = table.max_errors(check_body, check_dts)
+            print('{}: max error {:.6f} arcsec, {:.6f} km'.format(
+                type(check_body).__name__, angle_error, range_error))
@@ -0,0 +1,291 @@
+#!/usr/bin/python3
+"""Benchmarks for the astronomy module. Each configuration (direct calculation, the ephemeris
+cache, and an ephemeris table) is first checked against the worked examples from Astronomical
+Algorithms used in test_astronomy.py, then timed, reporting calls per second for the scalar and
+batched position and phase calculations and the latency per event for the event calculations.
+The ephemeris cache is cleared before each timed call, so the cached configuration measures cold
+calls, with repeated calls timed separately. Run with the astronomy module on the path, e.g.
+PYTHONPATH=../src python3 benchmark_astronomy.py, which exits with a non-zero status if any
+configuration has lost accuracy. With --events-per-day only the time per day of Body.events is
+reported, alongside the code path from before the nutation was shared with the sidereal time and
+optionally another version of the module given by --baseline."""
+
+import argparse
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta
+import importlib.util
+import os
+import sys
+import tempfile
+import timeit
+
+from dateutil import tz
+import numpy as np
+
+import astronomy
+from astronomy import (DEG_TO_RAD, RAD_TO_DEG, ONE_AU_IN_KM, Sun, Moon, SphericalCoordinate,
+                       EquatorialCoordinate)
+
+# Largest acceptable differences from the worked examples, matching the accuracy of the
+# ephemeris table.
+ANGLE_TOLERANCE_ARCSEC = 0.001
+RANGE_TOLERANCE_KM = 0.1
+EVENT_TOLERANCE_SECONDS = 10.0
+
+# Years covered by the ephemeris table built for the table configuration, which must include all
+# the worked examples.
+TABLE_YEARS = (1970, 2050)
+
+
+def deg_min_sec(degrees, minutes, seconds):
+    return degrees + minutes / 60.0 + seconds / 3600.0
+
+
+def hr_min_sec(hours, minutes, seconds):
+    return hours + minutes / 60.0 + seconds / 3600.0
+
+
+def check_accuracy():
+    """Compares the calculations against the worked examples, returning a list of descriptions of
+    any that differ by more than the tolerances."""
+    failures = []
+
+    def check_angle(name, actual_deg, expected_deg):
+        error = abs(actual_deg - expected_deg) * 3600.0
+        if error > ANGLE_TOLERANCE_ARCSEC:
+            failures.append('{}: {:.6f} arcsec error'.format(name, error))
+
+    def check_range(name, actual_km, expected_km):
+        error = abs(actual_km - expected_km)
+        if error > RANGE_TOLERANCE_KM:
+            failures.append('{}: {:.6f} km error'.format(name, error))
+
+    # Nutation from pp148 and sidereal time from pp88.
+    delta_psi, _, true_obliquity = astronomy.nutation(2446895.5)
+    check_angle('nutation delta psi', delta_psi * RAD_TO_DEG, -deg_min_sec(0, 0, 3.86276))
+    check_angle('true obliquity', true_obliquity * RAD_TO_DEG, deg_min_sec(23, 26, 36.87534))
+    check_angle('sidereal time', astronomy.greenwich_sidereal_time(2446895.5) * RAD_TO_DEG,
+                hr_min_sec(13, 10, 46.13056) * 15.0)
+
+    # Sun from pp169 and moon from pp343, both scalar and batched.
+    sun_spherical, _ = Sun().geocentric_position(2448908.5)
+    sun_batch, _ = Sun().geocentric_positions(np.array([2448908.5, 2448909.5]))
+    for name, spherical in (('sun', sun_spherical), ('batched sun', sun_batch[0])):
+        check_angle(name + ' longitude', spherical.lng * RAD_TO_DEG,
+                    deg_min_sec(199, 54, 21.93898))
+        check_angle(name + ' latitude', spherical.lat * RAD_TO_DEG, deg_min_sec(0, 0, 0.6202))
+        check_range(name + ' range', spherical.rng, 0.9976077495 * ONE_AU_IN_KM)
+    moon_position = Moon().geocentric_position(2448724.5)
+    moon_batch = Moon().geocentric_positions(np.array([2448724.5, 2448725.5]))
+    for name, (spherical, equatorial) in (('moon', moon_position),
+                                          ('batched moon', (moon_batch[0][0], moon_batch[1][0]))):
+        check_angle(name + ' longitude', spherical.lng * RAD_TO_DEG,
+                    deg_min_sec(133, 10, 2.0397648))
+        check_angle(name + ' latitude', spherical.lat * RAD_TO_DEG,
+                    -deg_min_sec(3, 13, 44.855109))
+        check_range(name + ' range', spherical.rng, 368409.6848161265)
+        check_angle(name + ' right ascension', equatorial.ra * RAD_TO_DEG,
+                    hr_min_sec(8, 58, 45.225115) * 15.0)
+        check_angle(name + ' declination', equatorial.decl * RAD_TO_DEG,
+                    deg_min_sec(13, 46, 6.15162036))
+
+    # Moon phase from pp347 at midnight DT, where a fraction illuminated of 1e-7 is under a
+    # second of time.
+    _, _, fraction = Moon().phase(astronomy.ut_to_datetime(astronomy.dt_to_ut(2448724.5)))
+    if abs(fraction - 0.6785677595168471) > 1e-7:
+        failures.append('moon phase: fraction {}'.format(fraction))
+
+    # Moon phase events from pp353.
+    for day, phase, expected in ((date(1977, 2, 18), 'new', datetime(1977, 2, 18, 3, 36, 54)),
+                                 (date(2044, 1, 21), 'last quarter',
+                                  datetime(2044, 1, 21, 23, 47, 8))):
+        events = [event for event in Moon().phase_events(day, day) if event[1] == phase]
+        error = (abs((events[0][0] - expected.replace(tzinfo=tz.UTC)).total_seconds())
+                 if events else float('inf'))
+        if error > EVENT_TOLERANCE_SECONDS:
+            failures.append('{} moon on {}: {} seconds error'.format(phase, day, error))
+
+    # Rise, transit, and set from pp103.
+    venus = astronomy.Body(-0.5667 * DEG_TO_RAD)
+    observer = SphericalCoordinate(42.3333 * DEG_TO_RAD, 71.0833 * DEG_TO_RAD)
+    eq_positions = [
+        EquatorialCoordinate(40.68021 * DEG_TO_RAD, deg_min_sec(18, 2, 51.4) * DEG_TO_RAD),
+        EquatorialCoordinate(41.73129 * DEG_TO_RAD, deg_min_sec(18, 26, 27.3) * DEG_TO_RAD),
+        EquatorialCoordinate(42.78204 * DEG_TO_RAD, deg_min_sec(18, 49, 38.7) * DEG_TO_RAD),
+    ]
+    events = venus._events_from_positions(eq_positions, 2447239.5, observer)
+    for (actual, _), expected in zip(events, (0.12129311, 0.51765558, 0.81979427)):
+        error = abs(actual - 2447240.5 - expected) * astronomy.SEC_IN_DAY
+        if error > EVENT_TOLERANCE_SECONDS:
+            failures.append('venus event: {} seconds error'.format(error))
+    return failures
+
+
+def clear_cache():
+    """Clears the ephemeris cache in use, if any."""
+    cache = astronomy.get_ephemeris_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def best_time(function, repeat, cold=True):
+    """Returns the fastest of repeat calls of function in seconds, clearing the ephemeris cache
+    before each call unless cold is False so that calls are not served from the results of the
+    previous one."""
+    return min(timeit.repeat(function, setup=clear_cache if cold else 'pass', number=1,
+                             repeat=repeat))
+
+
+def run_benchmarks(count, repeat):
+    """Times each calculation, yielding a tuple of (description, value, unit)."""
+    observer = SphericalCoordinate(deg_min_sec(37, 46, 0) * DEG_TO_RAD,
+                                   deg_min_sec(122, 25, 0) * DEG_TO_RAD)
+    rng = np.random.default_rng(0)
+    dts = rng.uniform(2451545.0, 2451545.0 + 3650.0, count)
+    scalar_dts = dts.tolist()
+    moments = [astronomy.ut_to_datetime(dt) for dt in scalar_dts]
+
+    for body in (Sun(), Moon()):
+        name = type(body).__name__
+        seconds = best_time(lambda: [body.geocentric_position(dt) for dt in scalar_dts], repeat)
+        yield ('{}.geocentric_position'.format(name), count / seconds, 'calls/s')
+        seconds = best_time(lambda: body.geocentric_positions(dts), repeat)
+        yield ('{}.geocentric_positions'.format(name), count / seconds, 'positions/s')
+        if astronomy.get_ephemeris_cache() is not None:
+            # Fill the cache first so every timed call is served from it.
+            for dt in scalar_dts:
+                body.geocentric_position(dt)
+            seconds = best_time(lambda: [body.geocentric_position(dt) for dt in scalar_dts],
+                                repeat, cold=False)
+            yield ('{}.geocentric_position (repeated)'.format(name), count / seconds, 'calls/s')
+
+    moon = Moon()
+    seconds = best_time(lambda: [moon.phase(moment) for moment in moments], repeat)
+    yield ('Moon.phase', count / seconds, 'calls/s')
+    seconds = best_time(lambda: moon.phases(dts), repeat)
+    yield ('Moon.phases', count / seconds, 'phases/s')
+
+    observers = [SphericalCoordinate(lat * DEG_TO_RAD, lng * DEG_TO_RAD)
+                 for lat in range(-50, 51, 10) for lng in range(-180, 180, 36)]
+    for body in (Sun(), Moon()):
+        name = type(body).__name__
+        events = body.events(date(2020, 1, 1), date(2020, 12, 31), observer)
+        seconds = best_time(lambda: body.events(date(2020, 1, 1), date(2020, 12, 31), observer),
+                            repeat)
+        yield ('{}.events'.format(name), seconds / len(events) * 1e6, 'us/event')
+        seconds = best_time(lambda: body.events(date(2020, 1, 1), date(2020, 12, 31), observer,
+                                                output='ut'),
+                            repeat)
+        yield ("{}.events (output='ut')".format(name), seconds / len(events) * 1e6, 'us/event')
+        all_events = body.events_for_observers(date(2020, 1, 1), date(2020, 12, 31), observers)
+        seconds = best_time(lambda: body.events_for_observers(date(2020, 1, 1),
+                                                              date(2020, 12, 31), observers),
+                            repeat)
+        yield ('{}.events_for_observers ({} observers)'.format(name, len(observers)),
+               seconds / sum(len(events) for events in all_events) * 1e6, 'us/event')
+
+
+def separate_nutation_events(body, min_date, max_date, observer):
+    """Calculates the events of body.events by the code path used before the Epoch was shared,
+    where the sidereal time calculates the nutation at each midnight again rather than reusing
+    that of the positions."""
+    first_midnight = min_date.toordinal() - 1 + astronomy.JD_OFFSET
+    midnights = first_midnight + np.arange((max_date - min_date).days + 3)
+    _, equatorial = body.geocentric_positions(astronomy.ut_to_dt(midnights))
+    (uts, event_types), = body._events_from_position_arrays(equatorial.ra, equatorial.decl,
+                                                            first_midnight, [observer])
+    return astronomy._format_events(uts, event_types, 'datetime')
+
+
+def run_events_per_day(days, repeat, baseline=None):
+    """Times Body.events by direct calculation over days days, yielding a tuple of (description,
+    value, unit) with the time per day, and the same for the previous code path and the module
+    baseline if supplied."""
+    observer = SphericalCoordinate(deg_min_sec(37, 46, 0) * DEG_TO_RAD,
+                                   deg_min_sec(122, 25, 0) * DEG_TO_RAD)
+    min_date = date(2020, 1, 1)
+    max_date = min_date + timedelta(days=days - 1)
+    modules = [astronomy] if baseline is None else [astronomy, baseline]
+    for module in modules:
+        label = '' if module is astronomy else ' (baseline)'
+        for body in (module.Sun(), module.Moon()):
+            name = type(body).__name__
+            # Versions of the module before the ephemeris cache always calculate directly.
+            with getattr(module, '_direct_calculation', nullcontext)():
+                seconds = best_time(lambda: body.events(min_date, max_date, observer), repeat)
+                yield ('{}.events{}'.format(name, label), seconds / days * 1e6, 'us/day')
+                if module is astronomy:
+                    seconds = best_time(lambda: separate_nutation_events(body, min_date, max_date,
+                                                                         observer), repeat)
+                    yield ('{}.events (separate nutation)'.format(name), seconds / days * 1e6,
+                           'us/day')
+
+
+def load_baseline(path):
+    """Imports the astronomy module at path under another name, for comparison."""
+    spec = importlib.util.spec_from_file_location('baseline_astronomy', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextmanager
+def configuration(name, table_path):
+    """Context manager which sets up the named configuration of the ephemeris cache and table."""
+    previous_cache = astronomy.set_ephemeris_cache(
+        astronomy.EphemerisCache() if name == 'cached' else None)
+    if name == 'table':
+        astronomy.use_ephemeris_table(table_path)
+    try:
+        yield
+    finally:
+        astronomy.use_ephemeris_table(None)
+        astronomy.set_ephemeris_cache(previous_cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the astronomy module.')
+    parser.add_argument('--count', type=int, default=2000,
+                        help='Number of times used in each position and phase benchmark.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of times to repeat each benchmark, reporting the fastest.')
+    parser.add_argument('--configurations', nargs='+', default=['direct', 'cached', 'table'],
+                        choices=['direct', 'cached', 'table'], help='Configurations to run.')
+    parser.add_argument('--events-per-day', action='store_true',
+                        help='Only time Body.events per day by direct calculation, along with the '
+                        'previous code path which calculates the nutation separately.')
+    parser.add_argument('--days', type=int, default=365,
+                        help='Number of days used in the events per day benchmark.')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='Another version of astronomy.py to time in the events per day '
+                        'benchmark, e.g. one written out by git show.')
+    args = parser.parse_args()
+
+    if args.events_per_day:
+        baseline = load_baseline(args.baseline) if args.baseline else None
+        for description, value, unit in run_events_per_day(args.days, args.repeat, baseline):
+            print('  {:<45} {:>12.1f} {}'.format(description, value, unit))
+        return 0
+
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        table_path = os.path.join(temp_dir, 'ephemeris.bin')
+        if 'table' in args.configurations:
+            astronomy.EphemerisTable.build(
+                table_path,
+                astronomy.ut_to_dt(date(TABLE_YEARS[0], 1, 1).toordinal() + astronomy.JD_OFFSET),
+                astronomy.ut_to_dt(date(TABLE_YEARS[1], 1, 1).toordinal() + astronomy.JD_OFFSET))
+        for name in args.configurations:
+            with configuration(name, table_path):
+                failures = check_accuracy()
+                print('{}: {}'.format(name, 'accuracy FAILED' if failures else 'accuracy ok'))
+                for failure in failures:
+                    print('  ' + failure)
+                failed = failed or bool(failures)
+                for description, value, unit in run_benchmarks(args.count, args.repeat):
+                    print('  {:<45} {:>12.1f} {}'.format(description, value, unit))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
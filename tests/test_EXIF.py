@@ -0,0 +1,341 @@
+#!/usr/bin/python3
+
+import io
+import json
+import os
+import pickle
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import EXIF
+
+# struct format characters for the values of each field type used in test images.
+TYPE_FORMATS = {1: 'B', 3: 'H', 4: 'I', 5: 'I', 7: 'B', 8: 'h', 9: 'i', 10: 'i'}
+
+THUMBNAIL = b'\xff\xd8 thumbnail \xff\xd9'
+
+def make_tiff(endian, ifds, blobs=None):
+    """Returns the bytes of a TIFF structure in the endian ('I' or 'M') containing a dictionary of
+    IFDs, each a list of (tag, field_type, values) entries. The first two IFDs are chained as the
+    image and thumbnail IFDs, values which are strings are replaced by the offset of the IFD or
+    blob of that name, and ASCII values are bytes without the terminating null."""
+    blobs = blobs or {}
+    prefix = '<' if endian == 'I' else '>'
+    offsets = {}
+    position = 8
+    for name, entries in ifds.items():
+        offsets[name] = position
+        position += 2 + 12 * len(entries) + 4
+    for name, blob in blobs.items():
+        offsets[name] = position
+        position += len(blob)
+    chain = list(ifds)[:2]
+
+    output = bytearray(b'II*\x00' if endian == 'I' else b'MM\x00*')
+    output += struct.pack(prefix + 'I', 8)
+    data = bytearray()
+    for name, entries in ifds.items():
+        output += struct.pack(prefix + 'H', len(entries))
+        for tag, field_type, values in sorted(entries):
+            if isinstance(values, str):
+                values = [offsets[values]]
+            if field_type == 2:
+                raw = values + b'\x00'
+                count = len(raw)
+            elif field_type in (5, 10):
+                raw = struct.pack(prefix + str(2 * len(values)) + TYPE_FORMATS[field_type],
+                                  *[number for ratio in values for number in ratio])
+                count = len(values)
+            else:
+                raw = struct.pack(prefix + str(len(values)) + TYPE_FORMATS[field_type], *values)
+                count = len(values)
+            if len(raw) <= 4:
+                field = raw.ljust(4, b'\x00')
+            else:
+                field = struct.pack(prefix + 'I', position + len(data))
+                data += raw
+            output += struct.pack(prefix + 'HHI', tag, field_type, count) + field
+        next_ifd = offsets[chain[1]] if name == chain[0] and len(chain) > 1 else 0
+        output += struct.pack(prefix + 'I', next_ifd)
+    for blob in blobs.values():
+        output += blob
+    return bytes(output + data)
+
+def make_jpeg(tiff, jfif=False):
+    """Returns the bytes of a minimal JPEG file with tiff as its EXIF information, optionally
+    preceded by a JFIF segment."""
+    output = b'\xff\xd8'
+    if jfif:
+        output += b'\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    return output + b'\xff\xe1' + struct.pack('>H', len(tiff) + 8) + b'Exif\x00\x00' + tiff \
+        + b'\xff\xd9'
+
+def sample_ifds():
+    """Returns the IFDs of a typical camera image for make_tiff."""
+    return {
+        'Image': [(0x010F, 2, b'Test Camera'), (0x0110, 2, b'Model 1'), (0x0112, 3, [6]),
+                  (0x011A, 5, [(72, 1)]), (0x8769, 4, 'EXIF'), (0x8825, 4, 'GPS')],
+        'Thumbnail': [(0x0103, 3, [6]), (0x0201, 4, 'thumbnail'), (0x0202, 4, [len(THUMBNAIL)])],
+        'EXIF': [(0x829A, 5, [(1, 250)]), (0x9003, 2, b'2024:04:08 18:17:16'),
+                 (0x9204, 10, [(-1, 3)]), (0x9286, 7, list(b'ASCII\x00\x00\x00A comment'))],
+        'GPS': [(0x0001, 2, b'N'), (0x0002, 5, [(37, 1), (46, 1), (3, 2)])],
+    }
+
+
+class EXIFTestCase(unittest.TestCase):
+    """Tests for extracting EXIF tags from synthetic images."""
+
+    def check_sample_tags(self, tags):
+        self.assertEqual(tags['Image Make'].printable, 'Test Camera')
+        self.assertEqual(tags['Image Orientation'].printable, 'Rotated 90 CW')
+        self.assertEqual(tags['Image XResolution'].printable, '72')
+        self.assertEqual(tags['EXIF ExposureTime'].printable, '1/250')
+        self.assertEqual(tags['EXIF ExposureBiasValue'].printable, '-1/3')
+        self.assertEqual(tags['EXIF DateTimeOriginal'].printable, '2024:04:08 18:17:16')
+        self.assertEqual(tags['EXIF UserComment'].printable, 'A comment')
+        self.assertEqual(tags['GPS GPSLatitudeRef'].printable, 'N')
+        self.assertEqual(tags['GPS GPSLatitude'].printable, '[37, 46, 3/2]')
+        self.assertEqual(tags['Thumbnail Compression'].printable,
+                         'JPEG (old-style)')
+        self.assertEqual(tags['JPEGThumbnail'], THUMBNAIL)
+
+    def test_process_file(self):
+        for endian in ('I', 'M'):
+            for jfif in (False, True):
+                data = make_jpeg(make_tiff(endian, sample_ifds(), {'thumbnail': THUMBNAIL}), jfif)
+                for buffered in (False, True):
+                    tags = EXIF.process_file(io.BytesIO(data), buffered=buffered)
+                    self.check_sample_tags(tags)
+
+    def test_tiff_file(self):
+        # TIFF files are memory mapped when buffered.
+        data = make_tiff('M', sample_ifds(), {'thumbnail': THUMBNAIL})
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'image.tif')
+            with open(path, 'wb') as f:
+                f.write(data)
+            for buffered in (False, True):
+                with open(path, 'rb') as f:
+                    self.check_sample_tags(EXIF.process_file(f, buffered=buffered))
+
+    def test_no_exif(self):
+        self.assertEqual(EXIF.process_file(io.BytesIO(b'\xff\xd8\xff\xd9')), {})
+        self.assertEqual(EXIF.process_file(io.BytesIO(b'not an image')), {})
+
+    def test_lazy_tags(self):
+        data = make_jpeg(make_tiff('I', sample_ifds(), {'thumbnail': THUMBNAIL}))
+        tags = EXIF.process_file(io.BytesIO(data))
+        eager_tags = EXIF.process_file(io.BytesIO(data), buffered=False)
+        for name in ('GPS GPSLatitude', 'Image Orientation', 'EXIF UserComment'):
+            self.assertNotIn('values', vars(tags[name]))
+            self.assertNotIn('printable', vars(tags[name]))
+            self.assertEqual(repr(tags[name]), repr(eager_tags[name]))
+            self.assertEqual(repr(tags[name].values), repr(eager_tags[name].values))
+        self.assertEqual(tags['GPS GPSLatitude'].values[2].num, 3)
+        self.check_sample_tags(tags)
+
+        # Tags from a memory mapped TIFF file are decoded when pickled.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'image.tif')
+            with open(path, 'wb') as f:
+                f.write(make_tiff('M', sample_ifds(), {'thumbnail': THUMBNAIL}))
+            with open(path, 'rb') as f:
+                tags = pickle.loads(pickle.dumps(EXIF.process_file(f)))
+        self.check_sample_tags(tags)
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'needs /proc/self/fd')
+    def test_kept_tiff_tags(self):
+        # Keeping the tags of memory mapped TIFF files doesn't keep them open.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'image.tif')
+            with open(path, 'wb') as f:
+                f.write(make_tiff('M', sample_ifds(), {'thumbnail': THUMBNAIL}))
+            open_files = len(os.listdir('/proc/self/fd'))
+            results = []
+            for i in range(50):
+                with open(path, 'rb') as f:
+                    results.append(EXIF.process_file(f))
+            self.assertLessEqual(len(os.listdir('/proc/self/fd')), open_files)
+            for tags in results:
+                self.check_sample_tags(tags)
+
+    def test_selected_tags(self):
+        full_data = make_jpeg(make_tiff('M', sample_ifds(), {'thumbnail': THUMBNAIL}))
+        full_tags = EXIF.process_file(io.BytesIO(full_data))
+        for tags, expected in (
+                ({'EXIF DateTimeOriginal', 'Image Orientation', 'GPS'},
+                 ['EXIF DateTimeOriginal', 'GPS GPSLatitude', 'GPS GPSLatitudeRef',
+                  'Image Orientation']),
+                ({'Image Make', 'JPEGThumbnail'}, ['Image Make', 'JPEGThumbnail']),
+                ({'Thumbnail Compression', 'Image Missing'}, ['Thumbnail Compression'])):
+            for buffered in (False, True):
+                selected = EXIF.process_file(io.BytesIO(full_data), buffered=buffered, tags=tags)
+                self.assertEqual(sorted(selected), expected)
+                for name in expected:
+                    self.assertEqual(repr(selected[name]), repr(full_tags[name]))
+
+        # Reading stops once all the tags are found, before the rest of the first IFD.
+        class CountingBytesIO(io.BytesIO):
+            def read(self, *args):
+                self.reads = getattr(self, 'reads', 0) + 1
+                return super().read(*args)
+        f = CountingBytesIO(full_data)
+        EXIF.process_file(f, buffered=False)
+        all_reads = f.reads
+        f = CountingBytesIO(full_data)
+        EXIF.process_file(f, buffered=False, tags={'Image Make'})
+        self.assertLess(f.reads, all_reads / 4)
+
+        # An undecodable MakerNote is only a problem when MakerNote tags are requested.
+        ifds = sample_ifds()
+        ifds['Image'][0] = (0x010F, 2, b'Canon')
+        ifds['EXIF'].append((0x927C, 7, [0] * 20))
+        data = make_jpeg(make_tiff('M', ifds, {'thumbnail': THUMBNAIL}))
+        tags = EXIF.process_file(io.BytesIO(data), tags={'EXIF DateTimeOriginal'})
+        self.assertEqual(tags['EXIF DateTimeOriginal'].printable, '2024:04:08 18:17:16')
+        with self.assertRaises(KeyError):
+            EXIF.process_file(io.BytesIO(data), tags={'MakerNote'})
+
+    def test_process_paths(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # A tree of images, with a file that is not an image which is skipped and a MakerNote
+            # which fails to decode.
+            os.makedirs(os.path.join(temp_dir, 'b', 'c'))
+            good = make_jpeg(make_tiff('I', sample_ifds(), {'thumbnail': THUMBNAIL}))
+            ifds = sample_ifds()
+            ifds['Image'][0] = (0x010F, 2, b'Canon')
+            ifds['EXIF'].append((0x927C, 7, [0] * 20))
+            bad = make_jpeg(make_tiff('M', ifds, {'thumbnail': THUMBNAIL}))
+            for name, data in (('a.jpg', good), ('b/1.JPG', good), ('b/c/2.jpeg', bad),
+                               ('b/c/3.jpg', good), ('b/notes.txt', b'text')):
+                with open(os.path.join(temp_dir, name), 'wb') as f:
+                    f.write(data)
+            paths = [temp_dir, os.path.join(temp_dir, 'missing.jpg')]
+            expected_paths = [os.path.join(temp_dir, name)
+                              for name in ('a.jpg', 'b/1.JPG', 'b/c/2.jpeg', 'b/c/3.jpg',
+                                           'missing.jpg')]
+
+            for workers in (1, 2):
+                results = list(EXIF.process_paths(paths, workers=workers))
+                self.assertEqual([result[0] for result in results], expected_paths)
+                for path, tags, error in results[:2] + results[3:4]:
+                    self.assertIsNone(error)
+                    self.assertEqual(tags['EXIF DateTimeOriginal'], '2024:04:08 18:17:16')
+                    self.assertEqual(tags['GPS GPSLatitude'], '[37, 46, 3/2]')
+                    self.assertNotIn('JPEGThumbnail', tags)
+                self.assertTrue(results[2][2].startswith('KeyError'))
+                self.assertTrue(results[4][2].startswith('FileNotFoundError'))
+
+            # The command line outputs the same results as lines of JSON.
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(EXIF.__file__))
+            process = subprocess.run([sys.executable, EXIF.__file__, '--json', '-w', '2'] + paths,
+                                     env=env, capture_output=True, text=True)
+            self.assertEqual(process.returncode, 1)
+            lines = [json.loads(line) for line in process.stdout.splitlines()]
+            self.assertEqual([line['path'] for line in lines], expected_paths)
+            self.assertEqual(lines[0]['tags'], results[0][1])
+            self.assertEqual(lines[2]['error'], results[2][2])
+            process = subprocess.run([sys.executable, EXIF.__file__, '--json', '-w', '1',
+                                      '--tags', 'EXIF DateTimeOriginal,GPS'] + paths,
+                                     env=env, capture_output=True, text=True)
+            lines = [json.loads(line) for line in process.stdout.splitlines()]
+            self.assertEqual(sorted(lines[2]['tags']),
+                             ['EXIF DateTimeOriginal', 'GPS GPSLatitude', 'GPS GPSLatitudeRef'])
+
+            # The cache options are rejected rather than ignored without --json and --cache.
+            for options in (['--cache', os.path.join(temp_dir, 'cache.db')], ['--json', '-e']):
+                process = subprocess.run([sys.executable, EXIF.__file__] + options + paths,
+                                         env=env, capture_output=True, text=True)
+                self.assertEqual(process.returncode, 2)
+                self.assertTrue(process.stdout.startswith('Usage:'))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data = make_jpeg(make_tiff('I', sample_ifds(), {'thumbnail': THUMBNAIL}))
+            paths = [os.path.join(temp_dir, name) for name in ('a.jpg', 'b.jpg', 'c.jpg')]
+            for path in paths:
+                with open(path, 'wb') as f:
+                    f.write(data)
+            cache_path = os.path.join(temp_dir, 'cache.db')
+
+            with EXIF.EXIF_cache(cache_path) as cache:
+                expected = list(EXIF.process_paths(paths, workers=1))
+                self.assertEqual(list(EXIF.process_paths(paths, workers=2, cache=cache)),
+                                 expected)
+                self.assertEqual((cache.hits, cache.misses), (0, 3))
+                self.assertEqual(len(cache), 3)
+
+            # Unchanged files are served from the cache after reopening it without being opened,
+            # shown by replacing the contents of a file but keeping its size and modification
+            # time.
+            stat = os.stat(paths[0])
+            with open(paths[0], 'wb') as f:
+                f.write(bytes(len(data)))
+            os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            with EXIF.EXIF_cache(cache_path) as cache:
+                self.assertEqual(list(EXIF.process_paths(paths, workers=1, cache=cache)),
+                                 expected)
+                self.assertEqual((cache.hits, cache.misses), (3, 0))
+                self.assertEqual(cache.hit_rate(), 1.0)
+                with open(paths[0], 'wb') as f:
+                    f.write(data)
+                os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+                # Files with a new size or modification time, or processed with different
+                # options, are processed again, while the unchanged file is still cached.
+                with open(paths[1], 'ab') as f:
+                    f.write(b'\x00')
+                stat = os.stat(paths[2])
+                os.utime(paths[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+                self.assertEqual(cache.process_path(paths[0]), expected[0])
+                self.assertEqual(cache.process_path(paths[1]), (paths[1],) + expected[1][1:])
+                self.assertEqual(cache.process_path(paths[2]), expected[2])
+                self.assertNotIn('EXIF UserComment',
+                                 cache.process_path(paths[2], details=False)[1])
+                self.assertEqual((cache.hits, cache.misses), (4, 3))
+
+                # Deleted files are evicted.
+                os.remove(paths[0])
+                self.assertEqual(cache.evict_missing(), 1)
+                self.assertEqual(len(cache), 2)
+
+            # Relative paths are looked up and evicted the same from any directory.
+            cwd = os.getcwd()
+            try:
+                os.chdir(temp_dir)
+                with EXIF.EXIF_cache(cache_path) as cache:
+                    self.assertEqual(cache.process_path('b.jpg'), ('b.jpg',) + expected[1][1:])
+                    cache.process_path('c.jpg', stop_tag='DateTimeOriginal')
+                    self.assertEqual((cache.hits, cache.misses), (1, 1))
+                os.chdir(os.path.dirname(temp_dir))
+                with EXIF.EXIF_cache(cache_path) as cache:
+                    cache.process_path(paths[2], stop_tag='DateTimeOriginal')
+                    self.assertEqual((cache.hits, cache.misses), (1, 0))
+                    self.assertEqual(cache.evict_missing(), 0)
+                    self.assertEqual(len(cache), 2)
+            finally:
+                os.chdir(cwd)
+
+            # Errors opening a file are not cached, unlike errors decoding one.
+            unreadable = os.path.join(temp_dir, 'd.jpg')
+            os.mkdir(unreadable)
+            ifds = sample_ifds()
+            ifds['Image'][0] = (0x010F, 2, b'Canon')
+            ifds['EXIF'].append((0x927C, 7, [0] * 20))
+            undecodable = os.path.join(temp_dir, 'e.jpg')
+            with open(undecodable, 'wb') as f:
+                f.write(make_jpeg(make_tiff('M', ifds, {'thumbnail': THUMBNAIL})))
+            with EXIF.EXIF_cache(cache_path) as cache:
+                for workers in (1, 2):
+                    result, = EXIF.process_paths([undecodable], workers=workers, cache=cache)
+                    self.assertTrue(result[2].startswith('KeyError'))
+                    result = cache.process_path(unreadable)
+                    self.assertTrue(result[2].startswith('IsADirectoryError'))
+                self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
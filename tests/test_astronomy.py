@@ -1,9 +1,14 @@
 #!/usr/bin/python3
 
 import unittest
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+import os
+import subprocess
+import sys
+import tempfile
 
 from dateutil import tz
+import numpy as np
 
 import astronomy
 from astronomy import (DEG_TO_RAD, RAD_TO_DEG, TWO_PI, ONE_AU_IN_KM, Body, Sun, Moon,
@@ -18,15 +23,50 @@ def deg_min_sec(degrees, minutes, seconds):
 def hr_min_sec(hours, minutes, seconds):
     return hours + minutes/60.0 + seconds/3600.0
 
+# Generous limit on the time to import astronomy, which is typically ~20ms.
+MAX_IMPORT_SECONDS = 0.25
+
 class TestAstronomy(unittest.TestCase):
     """Unit tests covering the astonomy module."""
 
+    def test_import_is_lightweight(self):
+        # Heavy dependencies should only be imported by the code paths that use them, keep an eye
+        # on the import time in a fresh interpreter to catch regressions.
+        script = ('import sys, time\n'
+                  'start = time.perf_counter()\n'
+                  'import astronomy\n'
+                  'elapsed = time.perf_counter() - start\n'
+                  'heavy = [m for m in ("numpy", "scipy", "dateutil") if m in sys.modules]\n'
+                  'print(elapsed, *heavy)\n'
+                  'astronomy.Moon().phase(astronomy.ut_to_datetime(2448724.5))\n'
+                  'print("numpy" in sys.modules)\n')
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(astronomy.__file__))
+        output = subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                                capture_output=True, text=True).stdout.split('\n')
+        elapsed, *heavy_modules = output[0].split()
+        self.assertEqual(heavy_modules, [])
+        self.assertLess(float(elapsed), MAX_IMPORT_SECONDS)
+        self.assertEqual(output[1], 'False')
+
     def test_linear_interpolator(self):
         interp = astronomy.Interpolator([1, 2, 3, 4], [1, 4, 9, 16])
         self.assertAlmostEqual(interp.at(1), 1)
         self.assertAlmostEqual(interp.at(1.5), 2.25)
         self.assertAlmostEqual(interp.at(3.5), 12.25)
 
+    def test_interpolator_arrays_and_short_inputs(self):
+        # A cubic is reproduced exactly, including when extrapolating, and arrays give the same
+        # results as scalars.
+        interp = astronomy.Interpolator([0, 1, 3, 4, 7], [x**3 - x for x in (0, 1, 3, 4, 7)])
+        x_values = np.array([-1.0, 0.5, 2.0, 5.5, 8.0])
+        results = interp.at(x_values)
+        for x, result in zip(x_values, results):
+            self.assertAlmostEqual(result, x**3 - x)
+            self.assertAlmostEqual(interp.at(float(x)), result)
+        # Fewer points fall back to a quadratic or linear fit.
+        self.assertAlmostEqual(astronomy.Interpolator([1, 2, 3], [1, 4, 9]).at(2.5), 6.25)
+        self.assertAlmostEqual(astronomy.Interpolator([1, 3], [1, 9]).at(2.5), 7)
+
     def test_anglular_interpolator(self):
         interp = astronomy.AngularInterpolator([1, 2, 3, 4, 5, 6],
                                                [y*DEG_TO_RAD for y in (315, 45, 135, 225, 315, 45)])
@@ -48,6 +88,18 @@ class TestAstronomy(unittest.TestCase):
         result = astronomy.datetime_to_ut(datetime(1957, 10, 4, 18, 0, 0, tzinfo=tz.UTC))
         self.assertAlmostEqual(result, 2436116.25)
 
+    def test_bulk_time_conversions(self):
+        uts = np.array([2451545.0, 2459000.123456, astronomy.POSIX_EPOCH_JD])
+        values = astronomy.ut_to_datetime64(uts)
+        self.assertEqual(values[2], np.datetime64('1970-01-01T00:00:00', 'us'))
+        for ut, value in zip(uts, values.tolist()):
+            self.assertEqual(value.replace(tzinfo=tz.UTC), astronomy.ut_to_datetime(ut))
+        np.testing.assert_allclose(astronomy.datetime64_to_ut(values), uts, rtol=0, atol=1e-10)
+        timestamps = astronomy.ut_to_posix(uts)
+        self.assertEqual(timestamps[2], 0.0)
+        self.assertEqual(timestamps[0], datetime(2000, 1, 1, 12, tzinfo=tz.UTC).timestamp())
+        np.testing.assert_allclose(astronomy.posix_to_ut(timestamps), uts, rtol=0, atol=1e-10)
+
     def test_spherical_to_equatorial(self):
         # Example from pp95.
         spherical = SphericalCoordinate(6.684170 * DEG_TO_RAD, 113.215630 * DEG_TO_RAD)
@@ -55,6 +107,42 @@ class TestAstronomy(unittest.TestCase):
         self.assertAlmostEqual(equatorial.ra * RAD_TO_DEG, 116.328942507)
         self.assertAlmostEqual(equatorial.decl * RAD_TO_DEG, 28.026183126)
 
+    def test_coordinate_batches(self):
+        # Batches should convert like the individual coordinates they contain.
+        batch = astronomy.SphericalCoordinates([0.1, -0.2, 0.3], [1.0, 2.0, 6.0], [1.0, 2.0, 3.0])
+        self.assertEqual(len(batch), 3)
+        self.assertFalse(hasattr(batch[1], '__dict__'))
+        self.assertEqual((batch[1].lat, batch[1].lng, batch[1].rng), (-0.2, 2.0, 2.0))
+        self.assertEqual(len(batch[1:]), 2)
+        equatorial = batch.to_equatorial(23.4 * DEG_TO_RAD)
+        self.assertIsInstance(equatorial, astronomy.EquatorialCoordinates)
+        for i in range(len(batch)):
+            expected = batch[i].to_equatorial(23.4 * DEG_TO_RAD)
+            self.assertIsInstance(equatorial[i], EquatorialCoordinate)
+            self.assertAlmostEqual(equatorial[i].ra, expected.ra)
+            self.assertAlmostEqual(equatorial[i].decl, expected.decl)
+
+    def test_delta_t(self):
+        # Exact from the leap seconds since 1972, e.g. 37 leap seconds in 2020.
+        self.assertAlmostEqual(astronomy.delta_t(2459000.5), 69.184)
+        self.assertAlmostEqual(astronomy.delta_t(2448724.5), 58.184)
+        # Espenak-Meeus model before then, interpolated from the yearly table. 1900 and 1950 are
+        # close to the start of years so the values match the polynomials closely.
+        self.assertAlmostEqual(astronomy.delta_t(2415020.5), -2.79, places=1)
+        self.assertAlmostEqual(astronomy.delta_t(2433282.5), 29.07, places=1)
+        self.assertAlmostEqual(astronomy.delta_t(1000000.5), astronomy._espenak_meeus_delta_t(
+            2000.0 + (1000000.5 - 2451544.5) / 365.2425))
+        # Batched lookups match the scalar ones.
+        uts = np.linspace(1000000.5, 2488069.5, 1001)
+        np.testing.assert_allclose(astronomy.delta_t(uts),
+                                   [astronomy.delta_t(ut) for ut in uts.tolist()])
+        np.testing.assert_allclose(astronomy.dt_to_ut(astronomy.ut_to_dt(uts)), uts,
+                                   rtol=0, atol=1e-9)
+        # A fixed value may be used instead.
+        self.addCleanup(astronomy.set_delta_t, astronomy.set_delta_t(69.184))
+        self.assertEqual(astronomy.delta_t(2415020.5), 69.184)
+        np.testing.assert_allclose(astronomy.delta_t(uts), 69.184)
+
     def test_nutation(self):
         # Example of nutation from pp148, modified result by 0.001" since our implementation is
         # the simple IAU expression for mean obliquity and also doesn't include T^2 and T^3 terms.
@@ -74,6 +162,23 @@ class TestAstronomy(unittest.TestCase):
         apparent_sidereal_time_hr = apparent_sidereal_time_rad / TWO_PI * 24.0
         self.assertAlmostEqual(apparent_sidereal_time_hr, hr_min_sec(8, 34, 56.84829))
 
+    def test_epoch(self):
+        # Calculations sharing an Epoch should match those calculating their own nutation.
+        self.addCleanup(astronomy.set_ephemeris_cache, astronomy.set_ephemeris_cache(None))
+        uts = np.array([2448724.5, 2451545.0, 2460000.25])
+        epoch = astronomy.Epoch(astronomy.ut_to_dt(uts))
+        self.assertEqual(epoch.T.shape, uts.shape)
+        for i, ut in enumerate(uts):
+            self.assertAlmostEqual(epoch[i].true_obliquity,
+                                   astronomy.nutation(astronomy.ut_to_dt(ut))[2])
+            self.assertAlmostEqual(astronomy.greenwich_sidereal_time(ut, epoch[i]),
+                                   astronomy.greenwich_sidereal_time(ut))
+        for body in (Sun(), Moon()):
+            _, shared = body.geocentric_positions(epoch)
+            _, separate = body.geocentric_positions(epoch.dt)
+            np.testing.assert_allclose(shared.ra, separate.ra)
+            np.testing.assert_allclose(shared.decl, separate.decl)
+
     def test_sun_ecliptic_position(self):
         # Example from pp169. Testing only the spherical coordinates since conversion is tested
         # separately.
@@ -82,6 +187,23 @@ class TestAstronomy(unittest.TestCase):
         self.assertAlmostEqual(spherical.lat * RAD_TO_DEG, deg_min_sec(0, 0, 0.6202))
         self.assertAlmostEqual(spherical.rng / ONE_AU_IN_KM, 0.9976077495)
 
+    def test_sun_batched_positions(self):
+        # The batched calculation should match the scalar calculation, including for the book
+        # example and times far from J2000.
+        self.addCleanup(astronomy.set_ephemeris_cache, astronomy.set_ephemeris_cache(None))
+        sun = Sun()
+        dts = np.array([2448908.5, 2415020.5, 2451545.0, 2488069.5])
+        spherical, equatorial = sun.geocentric_positions(dts)
+        self.assertEqual(spherical.lng.shape, dts.shape)
+        for i, dt in enumerate(dts):
+            expected_spherical, expected_equatorial = sun.geocentric_position(dt)
+            self.assertAlmostEqual(spherical.lng[i], expected_spherical.lng)
+            self.assertAlmostEqual(spherical.lat[i], expected_spherical.lat)
+            self.assertAlmostEqual(spherical.rng[i] / ONE_AU_IN_KM,
+                                   expected_spherical.rng / ONE_AU_IN_KM)
+            self.assertAlmostEqual(equatorial.ra[i], expected_equatorial.ra)
+            self.assertAlmostEqual(equatorial.decl[i], expected_equatorial.decl)
+
     def test_moon_ecliptic_position(self):
         # Example from pp343.
         spherical, equatorial = Moon().geocentric_position(2448724.5)
@@ -91,12 +213,112 @@ class TestAstronomy(unittest.TestCase):
         self.assertAlmostEqual(equatorial.ra * 24 / TWO_PI, hr_min_sec(8, 58, 45.225115))
         self.assertAlmostEqual(equatorial.decl * RAD_TO_DEG, deg_min_sec(13, 46, 6.15162036))
 
+    def test_moon_batched_positions(self):
+        # The batched calculation should match the scalar calculation, including for the book
+        # example and times far from J2000.
+        self.addCleanup(astronomy.set_ephemeris_cache, astronomy.set_ephemeris_cache(None))
+        moon = Moon()
+        dts = np.array([2448724.5, 2415020.5, 2451545.0, 2488069.5])
+        spherical, equatorial = moon.geocentric_positions(dts)
+        self.assertEqual(spherical.lng.shape, dts.shape)
+        for i, dt in enumerate(dts):
+            expected_spherical, expected_equatorial = moon.geocentric_position(dt)
+            self.assertAlmostEqual(spherical.lng[i], expected_spherical.lng)
+            self.assertAlmostEqual(spherical.lat[i], expected_spherical.lat)
+            self.assertAlmostEqual(spherical.rng[i], expected_spherical.rng)
+            self.assertAlmostEqual(equatorial.ra[i], expected_equatorial.ra)
+            self.assertAlmostEqual(equatorial.decl[i], expected_equatorial.decl)
+
+    def test_precision(self):
+        # Reduced precisions should stay within their documented error bounds using fewer terms.
+        self.addCleanup(astronomy.set_ephemeris_cache, astronomy.set_ephemeris_cache(None))
+        dts = np.linspace(2415020.5, 2488069.5, 500)
+        bounds = {'arcsecond': (1.0, 2.0), 'arcminute': (40.0, 60.0)}
+        for body_class, bound_index in ((Sun, 0), (Moon, 1)):
+            full = body_class().geocentric_positions(dts)[0]
+            for precision, bound in bounds.items():
+                body = body_class(precision)
+                reduced = body.geocentric_positions(dts)[0]
+                lng_error = (reduced.lng - full.lng + np.pi) % (2 * np.pi) - np.pi
+                error = np.hypot(lng_error * np.cos(full.lat), reduced.lat - full.lat)
+                self.assertLess(error.max() * RAD_TO_DEG * 3600, bound[bound_index])
+                expected_spherical = body.geocentric_position(dts[0])[0]
+                self.assertAlmostEqual(reduced.lng[0], expected_spherical.lng)
+        self.assertLess(len(astronomy._sun_series('arcminute')[0][0]),
+                        len(astronomy._sun_series('full')[0][0]))
+        # Powers of Tau left without terms are dropped.
+        self.assertLess(len(astronomy._sun_series('arcminute')[2]),
+                        len(astronomy._sun_series('full')[2]))
+        for full_terms, terms in zip(astronomy._moon_series('full'),
+                                     astronomy._moon_series('arcminute')):
+            self.assertLess(len(terms), len(full_terms))
+        # The distance terms are truncated separately from the longitude terms.
+        terms_L, terms_R, _ = astronomy._moon_series('arcsecond')
+        self.assertLess(len(terms_R), len(terms_L) / 2)
+        full = Moon().geocentric_positions(dts)[0]
+        reduced = Moon('arcsecond').geocentric_positions(dts)[0]
+        self.assertLess(np.abs(reduced.rng - full.rng).max(), 100.0)
+        with self.assertRaises(ValueError):
+            Sun('milliarcsecond')
+
     def test_moon_phase(self):
-        # Example from pp347, expressing an earlier UT to match midnight DT in the example.
-        phase, desc, fraction = Moon().phase(datetime(1992, 4, 11, 23, 58, 51, tzinfo=tz.UTC))
-        self.assertAlmostEqual(phase * RAD_TO_DEG, 69.07558948833432)
+        # Example from pp347, expressing the UT that matches midnight DT in the example.
+        book_datetime = astronomy.ut_to_datetime(astronomy.dt_to_ut(2448724.5))
+        phase, desc, fraction = Moon().phase(book_datetime)
+        self.assertAlmostEqual(phase * RAD_TO_DEG, 69.07561770046517)
         self.assertEqual(desc, 'waxing gibbous')
-        self.assertAlmostEqual(fraction, 0.6785679894780358)
+        self.assertAlmostEqual(fraction, 0.6785677595168471)
+
+    def test_moon_phases(self):
+        # The batched calculation should match the scalar calculation, including the example
+        # from pp347.
+        book_ut = astronomy.dt_to_ut(2448724.5)
+        uts = np.array([book_ut, 2451545.0, 2460000.25])
+        phases, fractions = Moon().phases(uts)
+        for ut, phase, fraction in zip(uts, phases, fractions):
+            expected_phase, _, expected_fraction = Moon().phase(astronomy.ut_to_datetime(ut))
+            self.assertAlmostEqual(phase, expected_phase)
+            self.assertAlmostEqual(fraction, expected_fraction)
+        self.assertAlmostEqual(fractions[0], 0.6785677595168471)
+
+    def test_moon_phase_events(self):
+        # Examples from pp353, converted from the dynamical times in the book to UT. Our moon
+        # position is only accurate to ~10 arcseconds so allow a few seconds of error.
+        events = Moon().phase_events(date(1977, 2, 1), date(1977, 2, 28))
+        self.assertEqual([event[1] for event in events],
+                         ['full', 'last quarter', 'new', 'first quarter'])
+        self.assertLess(abs((events[2][0] - datetime(1977, 2, 18, 3, 36, 54, tzinfo=tz.UTC))
+                            .total_seconds()), 10.0)
+        events = Moon().phase_events(date(2044, 1, 21), date(2044, 1, 21))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][1], 'last quarter')
+        self.assertLess(abs((events[0][0] - datetime(2044, 1, 21, 23, 47, 8, tzinfo=tz.UTC))
+                            .total_seconds()), 10.0)
+        # A full year contains 12 or 13 of each phase.
+        events = Moon().phase_events(date(2020, 1, 1), date(2020, 12, 31))
+        for phase in astronomy.PRINCIPAL_PHASES:
+            self.assertIn(len([event for event in events if event[1] == phase]), (12, 13))
+
+    def test_eclipses(self):
+        # The eclipses of 2024 and their magnitudes from the NASA eclipse catalogues.
+        eclipses = Moon().eclipses(date(2024, 1, 1), date(2024, 12, 31))
+        self.assertEqual([(eclipse[0].date(), eclipse[1]) for eclipse in eclipses],
+                         [(date(2024, 3, 25), 'penumbral lunar'),
+                          (date(2024, 4, 8), 'total solar'),
+                          (date(2024, 9, 18), 'partial lunar'),
+                          (date(2024, 10, 2), 'annular solar')])
+        for eclipse, magnitude in zip(eclipses, (0.956, 1.0566, 0.085, 0.9326)):
+            self.assertAlmostEqual(eclipse[2], magnitude, delta=0.005)
+        self.assertLess(abs((eclipses[1][0] - datetime(2024, 4, 8, 18, 17, 16, tzinfo=tz.UTC))
+                            .total_seconds()), 60.0)
+        # Partial solar eclipse from pp384 with magnitude 0.740.
+        eclipse, = Moon().eclipses(date(1993, 5, 20), date(1993, 5, 22))
+        self.assertEqual(eclipse[1], 'partial solar')
+        self.assertAlmostEqual(eclipse[2], 0.740, delta=0.005)
+        # The 21st century has 224 solar and 228 lunar eclipses.
+        eclipses = Moon().eclipses(date(2001, 1, 1), date(2100, 12, 31))
+        self.assertEqual(len([eclipse for eclipse in eclipses if 'solar' in eclipse[1]]), 224)
+        self.assertEqual(len([eclipse for eclipse in eclipses if 'lunar' in eclipse[1]]), 228)
 
     def test_events_from_positions(self):
         # Example from pp103
@@ -137,6 +359,259 @@ class TestAstronomy(unittest.TestCase):
         ]
         self.assertEqual(truncated_events, expected_events)
 
+    def test_event_outputs(self):
+        observer = SphericalCoordinate(deg_min_sec(37, 46, 0) * DEG_TO_RAD,
+                                       deg_min_sec(122, 25, 0) * DEG_TO_RAD)
+        expected = Sun().events(date(2020, 7, 1), date(2020, 7, 31), observer)
+        uts, event_types = Sun().events(date(2020, 7, 1), date(2020, 7, 31), observer, output='ut')
+        self.assertEqual(event_types.tolist(), [event[1] for event in expected])
+        self.assertEqual([astronomy.ut_to_datetime(ut) for ut in uts],
+                         [event[0] for event in expected])
+        values, event_types = Sun().events(date(2020, 7, 1), date(2020, 7, 31), observer,
+                                           output='datetime64')
+        self.assertEqual(values.dtype, np.dtype('datetime64[us]'))
+        self.assertEqual(event_types.tolist(), [event[1] for event in expected])
+        with self.assertRaises(ValueError):
+            Sun().events(date(2020, 7, 1), date(2020, 7, 31), observer, output='posix')
+
+    def test_events_for_observers(self):
+        # San Francisco, Tromso (where the sun does not set in early July), and Sydney.
+        observers = [
+            SphericalCoordinate(deg_min_sec(37, 46, 0) * DEG_TO_RAD,
+                                deg_min_sec(122, 25, 0) * DEG_TO_RAD),
+            SphericalCoordinate(deg_min_sec(69, 40, 0) * DEG_TO_RAD,
+                                -deg_min_sec(18, 56, 0) * DEG_TO_RAD),
+            SphericalCoordinate(-deg_min_sec(33, 52, 0) * DEG_TO_RAD,
+                                -deg_min_sec(151, 12, 0) * DEG_TO_RAD),
+        ]
+        for body in (Sun(), Moon()):
+            all_events = body.events_for_observers(date(2020, 7, 1), date(2020, 7, 10), observers)
+            self.assertEqual(len(all_events), len(observers))
+            for observer, events in zip(observers, all_events):
+                self.assertEqual(events, body.events(date(2020, 7, 1), date(2020, 7, 10), observer))
+            if isinstance(body, Sun):
+                self.assertEqual(all_events[1], [])
+                self.assertEqual(len(all_events[2]), 30)
+
+
+    def test_horizontal(self):
+        # Example from pp95, with the azimuth measured from north rather than south.
+        observer = SphericalCoordinate(deg_min_sec(38, 55, 17) * DEG_TO_RAD,
+                                       deg_min_sec(77, 3, 56) * DEG_TO_RAD)
+        altitude, azimuth = astronomy._horizontal(2446896.30625, 347.3193375 * DEG_TO_RAD,
+                                                  -deg_min_sec(6, 43, 11.61) * DEG_TO_RAD,
+                                                  observer)
+        self.assertAlmostEqual(altitude * RAD_TO_DEG, 15.1249, places=3)
+        self.assertAlmostEqual(azimuth * RAD_TO_DEG, 248.0337, places=3)
+        # Refraction at the horizon is a little over half a degree, and zero at the zenith.
+        refraction = astronomy._refraction(np.array([0.0, np.pi / 2, -0.1])) * RAD_TO_DEG * 60
+        np.testing.assert_allclose(refraction, [28.98, 0.0, 0.0], atol=0.01)
+
+    def test_horizontal_track(self):
+        # San Francisco. The sun should be at its rising altitude at sunrise, due south at transit,
+        # and a little higher with refraction.
+        observer = SphericalCoordinate(deg_min_sec(37, 46, 0) * DEG_TO_RAD,
+                                       deg_min_sec(122, 25, 0) * DEG_TO_RAD)
+        events = Sun().events(date(2020, 7, 2), date(2020, 7, 2), observer)
+        uts = np.array([astronomy.datetime_to_ut(event[0]) for event in events])
+        altitude, azimuth = astronomy.horizontal_track(Sun(), observer, uts)
+        for event, event_altitude, event_azimuth in zip(events, altitude, azimuth):
+            if event[1] == 'transit':
+                self.assertAlmostEqual(event_azimuth * RAD_TO_DEG, 180.0, places=2)
+            else:
+                self.assertAlmostEqual(event_altitude * RAD_TO_DEG, -0.833, places=2)
+        refracted, _ = astronomy.horizontal_track(Sun(), observer, uts, refraction=True)
+        self.assertTrue(np.all(refracted > altitude))
+        # The shape of the times is preserved, and the moon is lowered by parallax.
+        altitude, azimuth = astronomy.horizontal_track(Moon(), observer, uts.reshape(1, -1))
+        self.assertEqual(altitude.shape, (1, len(uts)))
+        _, equatorial = Moon().geocentric_positions(astronomy.ut_to_dt(uts))
+        geocentric, _ = astronomy._horizontal(uts, equatorial.ra, equatorial.decl, observer)
+        self.assertTrue(np.all(altitude[0] < geocentric))
+
+    def test_ephemeris_cache(self):
+        cache = astronomy.EphemerisCache(max_size=10)
+        self.addCleanup(astronomy.set_ephemeris_cache, astronomy.set_ephemeris_cache(cache))
+        sun = Sun()
+        first, _ = sun.geocentric_position(2448908.5)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))  # Position and nutation.
+        second, _ = sun.geocentric_position(2448908.5)
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        # The moon is cached separately to the sun.
+        moon, _ = Moon().geocentric_position(2448908.5)
+        self.assertNotAlmostEqual(moon.lng, first.lng)
+        # Batched positions are calculated directly, without using the cache.
+        cache.clear()
+        sun.geocentric_position(2448908.5)
+        spherical, _ = sun.geocentric_positions(np.array([2448907.5, 2448908.5, 2448909.5]))
+        self.assertAlmostEqual(spherical.lng[1] * RAD_TO_DEG, deg_min_sec(199, 54, 21.93898))
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertEqual(len(cache), 2)
+        # Least recently used entries are evicted once full.
+        for i in range(20):
+            sun.geocentric_position(2448000.5 + i)
+        self.assertEqual(len(cache), 10)
+        sun.geocentric_position(2448019.5)
+        sun.geocentric_position(2448000.5)
+        self.assertEqual((cache.hits, cache.misses), (1, 44))
+        self.assertAlmostEqual(cache.hit_rate(), 1 / 45)
+        # Caching may be disabled entirely.
+        astronomy.set_ephemeris_cache(None)
+        self.assertIsNot(sun.geocentric_position(2448908.5)[0],
+                         sun.geocentric_position(2448908.5)[0])
+
+    def test_ephemeris_cache_events(self):
+        observer = SphericalCoordinate(42.3333 * DEG_TO_RAD, 71.0833 * DEG_TO_RAD)
+        self.addCleanup(astronomy.set_ephemeris_cache, astronomy.set_ephemeris_cache(None))
+        expected = Sun().events(date(2020, 1, 1), date(2020, 3, 1), observer)
+        cache = astronomy.EphemerisCache(max_size=100000)
+        astronomy.set_ephemeris_cache(cache)
+        self.assertEqual(Sun().events(date(2020, 1, 1), date(2020, 3, 1), observer), expected)
+        self.assertEqual((cache.hits, cache.misses), (0, 63))
+        # Repeated windows are served from the cache, and overlapping ones only calculate the
+        # new midnights.
+        self.assertEqual(Sun().events(date(2020, 1, 1), date(2020, 3, 1), observer), expected)
+        self.assertEqual((cache.hits, cache.misses), (63, 63))
+        Sun().events(date(2020, 2, 1), date(2020, 3, 10), observer)
+        self.assertEqual((cache.hits, cache.misses), (63 + 32, 63 + 9))
+        # Each precision is cached separately.
+        Sun('arcminute').events(date(2020, 1, 1), date(2020, 3, 1), observer)
+        self.assertEqual(cache.misses, 63 + 9 + 63)
+
+    def test_ephemeris_table(self):
+        self.addCleanup(astronomy.set_ephemeris_cache, astronomy.set_ephemeris_cache(None))
+        self.addCleanup(astronomy.use_ephemeris_table, None)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'ephemeris.bin')
+            self.assertFalse(astronomy.use_ephemeris_table(path))
+            table = astronomy.EphemerisTable.build(path, 2448000.5, 2449000.5)
+            check_dts = np.linspace(2448000.5, 2449000.4, 1001)
+            for body in (Sun(), Moon()):
+                angle_error, range_error = table.max_errors(body, check_dts)
+                self.assertLess(angle_error, 0.001)
+                self.assertLess(range_error, 0.1)
+
+            # Positions inside the table are interpolated, so match the book examples to the
+            # same precision as the direct calculation.
+            self.assertTrue(astronomy.use_ephemeris_table(path))
+            spherical, _ = Sun().geocentric_position(2448908.5)
+            self.assertAlmostEqual(spherical.lng * RAD_TO_DEG, deg_min_sec(199, 54, 21.93898))
+            spherical, equatorial = Moon().geocentric_position(2448724.5)
+            self.assertAlmostEqual(spherical.lat * RAD_TO_DEG, -deg_min_sec(3, 13, 44.855109))
+            self.assertAlmostEqual(equatorial.decl * RAD_TO_DEG, deg_min_sec(13, 46, 6.15162036))
+            spherical, _ = Sun().geocentric_positions(np.array([2448908.5, 2448909.5]))
+            self.assertAlmostEqual(spherical.lng[0] * RAD_TO_DEG, deg_min_sec(199, 54, 21.93898))
+            # Positions outside the table fall back to the direct calculation.
+            self.assertFalse(table.covers('Sun', 2415020.5))
+            spherical, _ = Sun().geocentric_positions(np.array([2415020.5, 2448908.5]))
+            self.assertAlmostEqual(spherical.lng[1] * RAD_TO_DEG, deg_min_sec(199, 54, 21.93898))
+            astronomy.use_ephemeris_table(None)
+
+    def test_iter_events(self):
+        # San Francisco, using short chunks to exercise the boundaries between them.
+        observer = SphericalCoordinate(deg_min_sec(37, 46, 0) * DEG_TO_RAD,
+                                       deg_min_sec(122, 25, 0) * DEG_TO_RAD)
+        for body in (Sun(), Moon()):
+            generator = body.iter_events(date(2020, 6, 1), date(2020, 9, 30), observer,
+                                         chunk_days=10)
+            streamed = [next(generator)]
+            self.assertEqual(streamed[0][0].date(), date(2020, 6, 1))
+            streamed.extend(generator)
+            expected = body.events(date(2020, 6, 1), date(2020, 9, 30), observer)
+            self.assertEqual(len(streamed), len(expected))
+            for actual, expected_event in zip(streamed, expected):
+                self.assertEqual(actual[1], expected_event[1])
+                self.assertLess(abs((actual[0] - expected_event[0]).total_seconds()), 1.0)
+
+    def test_almanac(self):
+        # San Francisco, sliding a 30 day window forward a day at a time and comparing against the
+        # events over the whole period.
+        observer = SphericalCoordinate(deg_min_sec(37, 46, 0) * DEG_TO_RAD,
+                                       deg_min_sec(122, 25, 0) * DEG_TO_RAD)
+        for body in (Sun(), Moon()):
+            all_uts, all_types = body.events(date(2020, 5, 25), date(2020, 8, 7), observer,
+                                             output='ut')
+            calculated = []
+            geocentric_positions = body.geocentric_positions
+            body.geocentric_positions = lambda epoch: (calculated.append(len(epoch.dt))
+                                                       or geocentric_positions(epoch))
+            almanac = astronomy.Almanac(body, observer)
+            for day in range(31):
+                start = date(2020, 6, 1) + timedelta(days=day)
+                uts, event_types = almanac.events(start, start + timedelta(days=30), output='ut')
+                in_window = ((all_uts >= start.toordinal() + astronomy.JD_OFFSET)
+                             & (all_uts < start.toordinal() + 31 + astronomy.JD_OFFSET))
+                np.testing.assert_array_equal(event_types, all_types[in_window])
+                np.testing.assert_allclose(uts, all_uts[in_window], rtol=0.0, atol=1.0 / 86400)
+            # After the first window only the position on one new midnight is needed each day.
+            self.assertEqual(calculated[1:], [1] * 30)
+            # Refreshing the same window needs no new positions and a window before the current
+            # one is calculated from scratch.
+            refreshed_uts, _ = almanac.events(date(2020, 7, 1), date(2020, 7, 31), output='ut')
+            np.testing.assert_array_equal(refreshed_uts, uts)
+            self.assertEqual(len(calculated), 31)
+            events = almanac.events(date(2020, 6, 1), date(2020, 6, 1))
+            self.assertEqual(len(calculated), 32)
+            self.assertEqual([event[1] for event in events],
+                             [event[1] for event in body.events(date(2020, 6, 1),
+                                                                date(2020, 6, 1), observer)])
+            self.assertEqual(events[0][0].date(), date(2020, 6, 1))
+
+    def test_altitude_crossings(self):
+        # San Francisco
+        observer = SphericalCoordinate(deg_min_sec(37, 46, 0) * DEG_TO_RAD,
+                                       deg_min_sec(122, 25, 0) * DEG_TO_RAD)
+        sun = Sun()
+        crossings = sun.altitude_crossings(date(2020, 7, 2), date(2020, 7, 3), observer,
+                                           astronomy.SUN_ALTITUDES)
+        self.assertEqual(len(crossings), 2 * 2 * len(astronomy.SUN_ALTITUDES))
+        self.assertEqual(crossings, sorted(crossings))
+        # Each evening the sun passes down through each altitude in turn.
+        self.assertEqual([(name, direction) for _, name, direction in crossings[:6]],
+                         [('golden hour', 'setting'), ('horizon', 'setting'),
+                          ('blue hour', 'setting'), ('civil twilight', 'setting'),
+                          ('nautical twilight', 'setting'), ('astronomical twilight', 'setting')])
+        # Crossing the horizon should match the rise and set events.
+        horizon = [(time, 'rise' if direction == 'rising' else 'set')
+                   for time, name, direction in crossings if name == 'horizon']
+        events = [event for event in sun.events(date(2020, 7, 2), date(2020, 7, 3), observer)
+                  if event[1] != 'transit']
+        self.assertEqual(len(horizon), len(events))
+        for actual, expected in zip(horizon, events):
+            self.assertEqual(actual[1], expected[1])
+            self.assertLess(abs((actual[0] - expected[0]).total_seconds()), 1.0)
+        # Custom altitudes may be supplied, but the sun never reaches 80 degrees here.
+        crossings = sun.altitude_crossings(date(2020, 7, 2), date(2020, 7, 3), observer,
+                                           {'high': 70 * DEG_TO_RAD, 'higher': 80 * DEG_TO_RAD})
+        self.assertEqual([(name, direction) for _, name, direction in crossings],
+                         [('high', 'rising'), ('high', 'setting')] * 2)
+
+    def test_parallel_events(self):
+        observers = [SphericalCoordinate(lat * DEG_TO_RAD, lng * DEG_TO_RAD)
+                     for lat in (-50, 0, 37, 70) for lng in (-120, 0, 120)]
+        for body in (Sun(), Moon()):
+            expected = body.events_for_observers(date(2020, 1, 1), date(2020, 3, 31), observers)
+            # Use small chunks so there are several boundaries in each dimension.
+            actual = astronomy.parallel_events(body, date(2020, 1, 1), date(2020, 3, 31),
+                                               observers, max_workers=2, chunk_days=20,
+                                               chunk_observers=5)
+            self.assertEqual(len(actual), len(expected))
+            for actual_events, expected_events in zip(actual, expected):
+                self.assertEqual([event[1] for event in actual_events],
+                                 [event[1] for event in expected_events])
+                for actual_event, expected_event in zip(actual_events, expected_events):
+                    self.assertLess(abs((actual_event[0] - expected_event[0]).total_seconds()),
+                                    2.0)
+            # The compact output should match.
+            actual_uts = astronomy.parallel_events(body, date(2020, 1, 1), date(2020, 3, 31),
+                                                   observers, max_workers=2, chunk_days=20,
+                                                   chunk_observers=5, output='ut')
+            for (uts, event_types), expected_events in zip(actual_uts, actual):
+                self.assertEqual(event_types.tolist(), [event[1] for event in expected_events])
+                self.assertEqual([astronomy.ut_to_datetime(ut) for ut in uts],
+                                 [event[0] for event in expected_events])
+
 
 if __name__ == '__main__':
     unittest.main()